@@ -0,0 +1,42 @@
+# bench/bench_classify.py
+#
+# Cost of classifying a count for fun facts, from small counts up to tens of
+# millions, run inside an event loop like the bot does (so sieve growth
+# happens in a worker thread, exactly as in production).
+#
+#   python bench/bench_classify.py [numbers_per_window]
+
+import sys
+import time
+import asyncio
+
+from fakes import load_bot
+
+WINDOWS = (1, 10_000, 1_000_000, 10_000_000, 30_000_000, 80_000_000)
+
+
+async def run(per_window: int) -> None:
+    botmod = load_bot()
+    botmod.PRIMES = botmod.PrimeSieve()
+
+    print(f"{'start':>12} {'µs/number':>10} {'hits':>7}  sieve limit")
+    for start in WINDOWS:
+        botmod.classify_number.cache_clear()
+        hits = 0
+        t0 = time.perf_counter()
+        for n in range(start, start + per_window):
+            if botmod.classify_number(n):
+                hits += 1
+        us = (time.perf_counter() - t0) / per_window * 1e6
+        print(f"{start:>12,} {us:>10.3f} {hits:>7}  {botmod.PRIMES.limit:,}")
+        # let a background sieve build finish before the next window
+        while botmod.PRIMES._growing:
+            await asyncio.sleep(0.05)
+
+    t0 = time.perf_counter()
+    botmod.PrimeSieve._build(botmod.PRIME_SIEVE_MAX)
+    print(f"full sieve build ({botmod.PRIME_SIEVE_MAX:,}) in a worker: {time.perf_counter() - t0:.2f}s (off the loop)")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
@@ -0,0 +1,55 @@
+# bench/bench_dispatch.py
+#
+# Per-message cost of the on_message front door, before and after the prefix
+# pre-dispatch stage. "before" is what every message used to pay:
+# bot.process_commands() followed by the counting path.
+#
+#   python bench/bench_dispatch.py [messages]
+
+import sys
+import time
+
+from fakes import FakeChannel, FakeGuild, FakeMessage, FakeUser, load_bot, new_loop
+
+
+def run(n: int) -> None:
+    botmod = load_bot()
+    loop = new_loop()
+
+    guild = FakeGuild(1)
+    chan = FakeChannel(100, guild)
+    botmod.register_counting_channel(chan.id, guild.id)
+    users = [FakeUser(1000 + i) for i in range(2)]
+
+    def trace(count: int):
+        # alternating users posting the right number, like a healthy channel
+        start = botmod.get_state(guild.id).current_number
+        return [FakeMessage(chan, users[i % 2], str(start + i + 1)) for i in range(count)]
+
+    async def before(msgs):
+        for m in msgs:
+            await botmod.bot.process_commands(m)
+            await botmod.on_message(m)
+
+    async def after(msgs):
+        for m in msgs:
+            await botmod.on_message(m)
+
+    # keep the lucky/milestone branches out of the measurement
+    st = botmod.get_state(guild.id)
+    results = {}
+    for label, fn in (("before", before), ("after", after)):
+        st.lucky_target = st.next_milestone = -1
+        msgs = trace(n)
+        t0 = time.perf_counter()
+        loop.run_until_complete(fn(msgs))
+        results[label] = (time.perf_counter() - t0) / n * 1e6
+
+    print(f"messages: {n}")
+    for label, us in results.items():
+        print(f"{label:>7}: {us:8.2f} µs/message")
+    print(f"speedup: {results['before'] / results['after']:.2f}x")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
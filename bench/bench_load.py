@@ -0,0 +1,241 @@
+# bench/bench_load.py
+#
+# Replay/load benchmark for the counting engine. Drives the real on_message
+# (and through it get_state, the mini-game, ticket jobs, the write-behind
+# flush and the event log) for N guilds at M messages/sec of mixed traffic:
+# mostly correct counts, some chat, the odd wrong number, and mini-game
+# answers while a game is running. Reports throughput, p50/p99 handler latency, cold get_state
+# cost and memory growth (tracemalloc) over a second, traced pass.
+#
+#   python bench/bench_load.py [guilds] [messages_per_sec] [seconds] [trace.jsonl]
+#
+# messages_per_sec is the aggregate rate; 0 replays as fast as possible, one
+# message at a time. Latency is measured from when a message was due, so a
+# paced run that falls behind shows it in p99.
+#
+# A recorded trace is JSON lines of {"t": seconds, "guild": id, "user": id,
+# "content": "..."}; it replaces the synthetic traffic and sets the pace.
+#
+# Exits 1 if any handler raised, or if BENCH_MAX_P99_MS is set and the
+# on_message p99 is over it, so CI can gate on it.
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import tempfile
+import tracemalloc
+
+# exercise the event log writer too, in a throwaway directory
+_LOG_DIR = tempfile.TemporaryDirectory()
+os.environ.setdefault("PRIZO_EVENT_LOG", os.path.join(_LOG_DIR.name, "events.jsonl"))
+
+from fakes import FakeChannel, FakeGuild, FakeMessage, FakeUser, load_bot, new_loop
+
+USERS_PER_GUILD = 8
+# (kind, weight) for synthetic traffic
+MIX = (("correct", 84), ("chat", 12), ("wrong", 2), ("answer", 2))
+CHAT = ("gg", "lol nice", "who's next?", "brb", "🔥🔥", "ok counting again")
+
+
+class World:
+    def __init__(self, botmod, guilds: int):
+        self.botmod = botmod
+        self.guilds = {}
+        self.channels = {}
+        self.users = {}
+        for k in range(guilds):
+            gid = (k << 22) + 1
+            guild = FakeGuild(gid)
+            chan = FakeChannel(gid + 1, guild)
+            self.guilds[gid] = guild
+            self.channels[chan.id] = chan
+            self.users[gid] = [FakeUser(gid * 100 + i) for i in range(USERS_PER_GUILD)]
+            botmod.register_counting_channel(chan.id, gid)
+        # ticket jobs look guilds/channels up on the client
+        botmod.bot.get_guild = self.guilds.get
+        botmod.bot.get_channel = self.channels.get
+        self.chan_list = list(self.channels.values())
+        self.kinds = [k for k, _ in MIX]
+        self.weights = [w for _, w in MIX]
+
+    def synthetic(self, rng: random.Random) -> FakeMessage:
+        botmod = self.botmod
+        chan = rng.choice(self.chan_list)
+        gid = chan.guild.id
+        st = botmod.get_state(gid)
+        last = st.last_user_id
+        user = rng.choice(self.users[gid])
+        if user.id == last:
+            user = self.users[gid][(self.users[gid].index(user) + 1) % USERS_PER_GUILD]
+
+        kind = rng.choices(self.kinds, self.weights)[0]
+        game = botmod.ACTIVE_GAMES.get(chan.id)
+        if kind == "answer" or (game is not None and rng.random() < 0.3):
+            text = str(game.answer) if game is not None else str(st.current_number + 1)
+        elif kind == "correct":
+            text = str(st.current_number + 1)
+        elif kind == "wrong":
+            text = str(st.current_number + rng.randint(2, 9))
+        else:
+            text = rng.choice(CHAT)
+        return FakeMessage(chan, user, text)
+
+    def recorded(self, row) -> FakeMessage:
+        gid = int(row["guild"])
+        if gid not in self.guilds:
+            guild = self.guilds[gid] = FakeGuild(gid)
+            chan = self.channels[gid + 1] = FakeChannel(gid + 1, guild)
+            self.botmod.register_counting_channel(chan.id, gid)
+        chan = self.channels[gid + 1]
+        return FakeMessage(chan, FakeUser(int(row["user"])), row["content"])
+
+
+def load_trace(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def pct(sorted_vals, q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * q))]
+
+
+async def drive(world: World, rate: float, seconds: float, rng: random.Random, trace, lat, errors) -> int:
+    botmod = world.botmod
+    pending = set()
+
+    async def handle(msg, due: float) -> None:
+        try:
+            await botmod.on_message(msg)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        lat.append(time.perf_counter() - due)
+
+    t0 = time.perf_counter()
+    sent = 0
+
+    if trace is not None:
+        for row in trace:
+            due = t0 + float(row.get("t", 0.0))
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(handle(world.recorded(row), due))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            sent += 1
+    elif rate <= 0:
+        while time.perf_counter() - t0 < seconds:
+            for _ in range(500):
+                await handle(world.synthetic(rng), time.perf_counter())
+                sent += 1
+            # let timers, ticket workers and mini-games run between batches
+            await asyncio.sleep(0)
+    else:
+        interval = 1.0 / rate
+        total = int(rate * seconds)
+        while sent < total:
+            due = t0 + sent * interval
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # dispatch everything that is due, like the gateway would
+            now = time.perf_counter()
+            while sent < total and t0 + sent * interval <= now:
+                task = asyncio.create_task(handle(world.synthetic(rng), t0 + sent * interval))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                sent += 1
+
+    if pending:
+        await asyncio.gather(*pending)
+    return sent
+
+
+async def cold_get_state(botmod, world: World):
+    # persist everything, drop it from memory and time the reload from the store
+    await botmod.flush_state()
+    gids = list(world.guilds)
+    for gid in gids:
+        botmod.GUILDS.pop(gid, None)
+    times = []
+    for gid in gids:
+        t = time.perf_counter()
+        botmod.get_state(gid)
+        times.append(time.perf_counter() - t)
+    times.sort()
+    return times
+
+
+async def run(guilds: int, rate: float, seconds: float, trace_path: str) -> int:
+    botmod = load_bot()
+    trace = load_trace(trace_path) if trace_path else None
+    world = World(botmod, guilds)
+    rng = random.Random(1234)
+
+    for coro in (botmod.timer_loop(), botmod.state_flush_loop(), botmod.event_log_loop()):
+        asyncio.get_running_loop().create_task(coro)
+    await botmod.start_ticket_queue()
+
+    # pass 1: timing
+    lat, errors = [], []
+    t0 = time.perf_counter()
+    sent = await drive(world, rate, seconds, rng, trace, lat, errors)
+    wall = time.perf_counter() - t0
+    lat.sort()
+    games = dict(botmod.METRICS)
+
+    # pass 2: same traffic with tracemalloc on, for growth only
+    tracemalloc.start()
+    await asyncio.sleep(0)
+    base = tracemalloc.take_snapshot()
+    base_bytes = tracemalloc.get_traced_memory()[0]
+    sent2 = await drive(world, rate, seconds, rng, trace, [], errors)
+    await botmod.flush_state()
+    await botmod.EVENTS.flush()
+    end = tracemalloc.take_snapshot()
+    end_bytes, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    cold = await cold_get_state(botmod, world)
+
+    mode = "replay" if trace is not None else ("flat out" if rate <= 0 else f"{rate:,.0f} msg/s target")
+    print(f"guilds: {len(world.guilds)}  mode: {mode}  messages: {sent:,} in {wall:.2f}s")
+    print(f"throughput:           {sent / wall:>10,.0f} msg/s")
+    print(f"on_message p50/p99:   {pct(lat, 0.50) * 1e6:>10.1f} / {pct(lat, 0.99) * 1e6:.1f} µs")
+    print(f"get_state cold p50/p99:{pct(cold, 0.50) * 1e6:>9.1f} / {pct(cold, 0.99) * 1e6:.1f} µs")
+    print(
+        f"mini-games: {games['minigames_started']} started, {games['minigames_solved']} solved, "
+        f"{games['minigames_timed_out']} timed out; tickets: {games['tickets_created']} created"
+    )
+    grew = end_bytes - base_bytes
+    print(
+        f"memory over {sent2:,} more messages: {grew / 1024:+,.1f} KiB "
+        f"({grew / max(sent2, 1):+.1f} B/msg), peak {peak / 1024:,.0f} KiB"
+    )
+    for stat in end.compare_to(base, "lineno")[:5]:
+        frame = stat.traceback[0]
+        print(f"    {stat.size_diff / 1024:+9.1f} KiB  {os.path.basename(frame.filename)}:{frame.lineno}")
+
+    status = 0
+    if errors:
+        print(f"handler errors: {len(errors)} (first: {errors[0]})")
+        status = 1
+    budget = os.getenv("BENCH_MAX_P99_MS")
+    if budget and pct(lat, 0.99) * 1e3 > float(budget):
+        print(f"on_message p99 over budget of {budget} ms")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    trace_path = args[3] if len(args) > 3 else ""
+    nums = [float(a) for a in args[:3]]
+    guilds, rate, seconds = nums + [200, 0, 5][len(nums):]
+    loop = new_loop()
+    sys.exit(loop.run_until_complete(run(int(guilds), rate, seconds, trace_path)))
@@ -0,0 +1,141 @@
+# bench/bench_memory.py
+#
+# Bytes per guild and snapshot (de)serialisation cost: the per-guild dict
+# that get_state() used to build versus the slotted GuildState. "quiet" is a
+# freshly loaded guild; "busy" has a benched user, two wrong streaks, three
+# tickets and a running tourney.
+#
+#   python bench/bench_memory.py [guilds ...]
+
+import gc
+import sys
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from fakes import load_bot
+
+
+def legacy_state(botmod, gid: int, busy: bool):
+    # the dict layout get_state() built before GuildState
+    st = {
+        "current_number": 1234,
+        "last_user_id": 42,
+        "words_only": False,
+        "ban_minutes": 5,
+        "wrong_streak": {},
+        "locks": {},
+        "tickets": botmod.TicketLedger(gid, []),
+        "lucky_prize": "Lucky number mini-game prize",
+        "lucky_min": 10,
+        "lucky_max": 100,
+        "lucky_target": 1290,
+        "milestone_min": 20,
+        "milestone_max": 150,
+        "next_milestone": 77,
+        "tourney_mode": False,
+        "tourney_wins": botmod.Leaderboard(),
+        "tourney_rounds": 0,
+        "tourney_trigger": 5,
+    }
+    if busy:
+        st["locks"][7] = datetime.utcnow() + timedelta(minutes=5)
+        st["wrong_streak"][(gid + 1, 8)] = 1
+        st["wrong_streak"][(gid + 1, 9)] = 2
+        for uid in (1, 2, 1):
+            st["tickets"].issue(uid, "1WL", 50)
+        st["tourney_mode"] = True
+        for uid in range(5):
+            st["tourney_wins"].add_win(uid)
+    return st
+
+
+def legacy_to_json(st):
+    data = dict(st)
+    del data["tickets"]
+    data["wrong_streak"] = {f"{c}:{u}": n for (c, u), n in st["wrong_streak"].items() if n}
+    data["locks"] = {str(uid): until.isoformat() for uid, until in st["locks"].items()}
+    data["tourney_wins"] = {str(uid): n for uid, n in st["tourney_wins"].wins.items()}
+    return data
+
+
+def legacy_from_json(botmod, gid: int, data):
+    st = legacy_state(botmod, gid, False)
+    streaks = {}
+    for k, n in (data.get("wrong_streak") or {}).items():
+        c, u = k.split(":")
+        streaks[(int(c), int(u))] = n
+    data["wrong_streak"] = streaks
+    data["locks"] = {int(uid): datetime.fromisoformat(v) for uid, v in (data.get("locks") or {}).items()}
+    data["tourney_wins"] = botmod.Leaderboard({int(uid): n for uid, n in (data.get("tourney_wins") or {}).items()})
+    st.update(data)
+    return st
+
+
+def slotted_state(botmod, gid: int, busy: bool):
+    st = botmod.GuildState(gid)
+    st.current_number, st.last_user_id, st.lucky_target, st.next_milestone = 1234, 42, 1290, 77
+    if busy:
+        st.locks = {7: time.time() + 300}
+        st.wrong_streak = {gid + 1: {8: 1, 9: 2}}
+        st._tickets = botmod.TicketLedger(gid, [])
+        for uid in (1, 2, 1):
+            st._tickets.issue(uid, "1WL", 50)
+        st.tourney_mode = True
+        for uid in range(5):
+            st.tourney_wins.add_win(uid)
+    return st
+
+
+def measure(build, n: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    states = {gid: build(gid) for gid in range(1 << 22, (1 << 22) + n)}
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del states
+    return (after - before) / n
+
+
+def time_roundtrip(to_json, from_json, st, rounds: int = 20_000):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        text = json.dumps(to_json(st))
+    t1 = time.perf_counter()
+    for _ in range(rounds):
+        from_json(json.loads(text))
+    t2 = time.perf_counter()
+    return (t1 - t0) / rounds * 1e6, (t2 - t1) / rounds * 1e6, len(text)
+
+
+def run(sizes) -> None:
+    botmod = load_bot()
+    botmod.DIRTY_TICKETS.clear()
+
+    print(f"{'guilds':>8} {'profile':>7} {'dict B/guild':>13} {'slots B/guild':>14} {'saved':>6}")
+    for n in sizes:
+        for busy in (False, True):
+            old = measure(lambda gid: legacy_state(botmod, gid, busy), n)
+            new = measure(lambda gid: slotted_state(botmod, gid, busy), n)
+            botmod.DIRTY_TICKETS.clear()
+            label = "busy" if busy else "quiet"
+            print(f"{n:>8,} {label:>7} {old:>13,.0f} {new:>14,.0f} {1 - new / old:>6.0%}")
+
+    print()
+    print(f"{'profile':>7} {'layout':>6} {'to_json µs':>11} {'from_json µs':>13} {'bytes':>6}")
+    for busy in (False, True):
+        label = "busy" if busy else "quiet"
+        gid = 1 << 22
+        old = time_roundtrip(legacy_to_json, lambda d: legacy_from_json(botmod, gid, d), legacy_state(botmod, gid, busy))
+        new = time_roundtrip(
+            lambda st: st.to_json(), lambda d: botmod.GuildState.from_json(gid, d), slotted_state(botmod, gid, busy)
+        )
+        for layout, (enc, dec, size) in (("dict", old), ("slots", new)):
+            print(f"{label:>7} {layout:>6} {enc:>11.2f} {dec:>13.2f} {size:>6}")
+        botmod.DIRTY_TICKETS.clear()
+
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,75 @@
+# bench/bench_outbox.py
+#
+# REST calls saved by the per-channel outbox. Busy channels with tight lucky
+# and milestone ranges and the odd wrong number, so most counts produce some
+# reply; every FakeChannel.send takes a REST round trip. Compares messages the
+# handlers posted (one REST call each before the outbox) with the sends that
+# actually went out, and reports the outbox's achieved sends/sec and depth.
+#
+#   python bench/bench_outbox.py [channels] [counts_per_channel] [latency_ms]
+
+import sys
+import time
+import random
+import asyncio
+
+from fakes import FakeChannel, FakeGuild, FakeMessage, FakeUser, load_bot, new_loop
+
+
+async def run(channels: int, counts: int, latency_ms: float) -> None:
+    botmod = load_bot()
+    FakeChannel.send_latency = latency_ms / 1000.0
+    botmod.MINIGAME_SECONDS = 0.3
+    rng = random.Random(1234)
+
+    chans = []
+    for k in range(channels):
+        gid = (k << 22) + 1
+        chan = FakeChannel(gid + 1, FakeGuild(gid))
+        botmod.register_counting_channel(chan.id, gid)
+        st = botmod.get_state(gid)
+        st.lucky_min, st.lucky_max = 3, 8
+        st.milestone_min, st.milestone_max = 4, 10
+        st.lucky_target = botmod.arm_new_lucky(st)
+        st.next_milestone = st.current_number + 5
+        chans.append(chan)
+    users = [FakeUser(1000 + i) for i in range(3)]
+    asyncio.get_running_loop().create_task(botmod.timer_loop())
+
+    depth = 0
+    t0 = time.perf_counter()
+    for i in range(counts):
+        for chan in chans:
+            st = botmod.GUILDS[chan.guild.id]
+            game = botmod.ACTIVE_GAMES.get(chan.id)
+            if game is not None and rng.random() < 0.5:
+                text = str(game.answer)
+            elif rng.random() < 0.04:
+                text = "0"
+            else:
+                text = str(st.current_number + 1)
+            await botmod.on_message(FakeMessage(chan, users[i % 3], text))
+        depth = max(depth, botmod.outbox_depth())
+        # a burst: every channel moves a step every 20ms
+        await asyncio.sleep(0.02)
+
+    # let games time out and every outbox drain (ticket jobs just queue up)
+    while botmod.ACTIVE_GAMES or botmod.OUTBOXES:
+        await asyncio.sleep(0.05)
+    wall = time.perf_counter() - t0
+
+    posts = botmod.METRICS["outbox_posts"]
+    sends = botmod.METRICS["outbox_sends"]
+    assert sends == sum(c.sends for c in chans)
+    print(f"channels: {channels}  counts/channel: {counts}  REST latency: {latency_ms:.0f} ms")
+    print(f"messages posted:      {posts:>8,}  (REST calls without the outbox)")
+    print(f"REST sends:           {sends:>8,}  ({posts / max(sends, 1):.1f}x fewer)")
+    print(f"achieved sends/sec:   {sends / wall:>8,.1f}  over {wall:.1f}s")
+    print(f"peak outbox depth:    {depth:>8,}")
+
+
+if __name__ == "__main__":
+    args = [float(a) for a in sys.argv[1:]]
+    channels, counts, latency = args + [20, 100, 150][len(args):]
+    loop = new_loop()
+    loop.run_until_complete(run(int(channels), int(counts), latency))
@@ -0,0 +1,93 @@
+# bench/bench_shards.py
+#
+# Load test for shard-partitioned workers: P processes, each importing bot.py
+# with its own PRIZO_SHARD_IDS, drive on_message for the guilds their shard
+# owns and flush to one shared SQLite file. Prints aggregate messages/sec for
+# each P; with enough cores it should grow close to linearly.
+#
+#   python bench/bench_shards.py [guilds] [messages_per_guild] [max_processes]
+
+import os
+import sys
+import time
+import tempfile
+import multiprocessing as mp
+
+
+def worker(shard_id: int, shards: int, db: str, guilds: int, per_guild: int, start, out) -> None:
+    os.environ["PRIZO_DB"] = db
+    os.environ["PRIZO_SHARD_COUNT"] = str(shards)
+    os.environ["PRIZO_SHARD_IDS"] = str(shard_id)
+    sys.stdout = open(os.devnull, "w")
+
+    from fakes import FakeChannel, FakeGuild, FakeMessage, FakeUser, load_bot, new_loop
+
+    botmod = load_bot()
+    loop = new_loop()
+
+    # guild ids whose (id >> 22) % shards lands on this worker
+    owned = [(k << 22) + k for k in range(guilds) if k % shards == shard_id]
+    chans = []
+    for gid in owned:
+        chan = FakeChannel(gid + 1, FakeGuild(gid))
+        botmod.register_counting_channel(chan.id, gid)
+        st = botmod.get_state(gid)
+        st.lucky_target = st.next_milestone = -1
+        chans.append(chan)
+    users = [FakeUser(1000), FakeUser(1001)]
+
+    async def drive() -> int:
+        sent = 0
+        for i in range(per_guild):
+            for chan in chans:
+                # mostly correct counts, some chat, the odd wrong number
+                if i % 10 == 9:
+                    text = "gg"
+                elif i % 50 == 49:
+                    text = "0"
+                else:
+                    text = str(botmod.GUILDS[chan.guild.id].current_number + 1)
+                await botmod.on_message(FakeMessage(chan, users[i % 2], text))
+                sent += 1
+        await botmod.flush_state()
+        return sent
+
+    start.wait()
+    t0 = time.perf_counter()
+    sent = loop.run_until_complete(drive())
+    out.put((sent, time.perf_counter() - t0))
+
+
+def run(guilds: int, per_guild: int, max_procs: int) -> None:
+    ctx = mp.get_context("spawn")
+    base = None
+    print(f"cores: {os.cpu_count()}  guilds: {guilds}  messages/guild: {per_guild}")
+    procs = 1
+    while procs <= max_procs:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, "prizo.db")
+            start = ctx.Event()
+            out = ctx.Queue()
+            workers = [
+                ctx.Process(target=worker, args=(i, procs, db, guilds, per_guild, start, out))
+                for i in range(procs)
+            ]
+            for w in workers:
+                w.start()
+            time.sleep(1.0)   # let every worker finish importing
+            t0 = time.perf_counter()
+            start.set()
+            results = [out.get() for _ in workers]
+            wall = time.perf_counter() - t0
+            for w in workers:
+                w.join()
+        total = sum(n for n, _ in results)
+        rate = total / wall
+        base = base or rate
+        print(f"processes: {procs:>2}  {rate:>10,.0f} msg/s  ({rate / base:.2f}x of 1 process)")
+        procs *= 2
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    run(*(args + [400, 50, 4][len(args):]))
@@ -0,0 +1,131 @@
+# bench/fakes.py
+#
+# Just enough of discord.py's Message / Guild / Channel surface to drive the
+# real handlers in bot.py offline. Every REST call is a no-op coroutine.
+
+import os
+import sys
+import types
+import asyncio
+import itertools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# bot.py refuses to import without a token; never touch the real database,
+# event log or metrics port
+os.environ.setdefault("DISCORD_TOKEN", "bench")
+os.environ.setdefault("PRIZO_DB", ":memory:")
+os.environ.setdefault("PRIZO_EVENT_LOG", "")
+os.environ.setdefault("PRIZO_METRICS_PORT", "0")
+# replayed traffic is far faster than any real channel; flood control would eat it
+os.environ.setdefault("PRIZO_FLOOD_USER", "off")
+os.environ.setdefault("PRIZO_FLOOD_CHANNEL", "off")
+
+_ids = itertools.count(10_000)
+
+
+class FakeSent:
+    def __init__(self, channel: "FakeChannel"):
+        self.id = next(_ids)
+        self.channel = channel
+        self.jump_url = f"https://discord.com/channels/{channel.guild.id}/{channel.id}/{self.id}"
+
+    async def edit(self, **kwargs):
+        return self
+
+    async def delete(self):
+        return None
+
+
+class FakeRole:
+    # hashable, so it can key a permission-overwrite dict
+    def __init__(self, rid: int):
+        self.id = rid
+
+
+class FakeGuild:
+    def __init__(self, gid: int):
+        self.id = gid
+        self.name = f"guild-{gid}"
+        self.me = FakeRole(1)
+        self.default_role = FakeRole(gid)
+
+    def get_member(self, uid: int):
+        return None
+
+    def get_channel(self, cid: int):
+        return None
+
+    def get_role(self, rid: int):
+        return None
+
+    async def create_text_channel(self, name: str, **kwargs):
+        return FakeChannel(next(_ids), self)
+
+
+class FakeChannel:
+    def __init__(self, cid: int, guild: FakeGuild):
+        self.id = cid
+        self.guild = guild
+        self.name = f"channel-{cid}"
+        self.mention = f"<#{cid}>"
+        self.jump_url = f"https://discord.com/channels/{guild.id}/{cid}"
+        self.sends = 0
+
+    # set to a REST round trip (seconds) to make sends take time
+    send_latency = 0.0
+
+    async def send(self, content=None, **kwargs):
+        self.sends += 1
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        return FakeSent(self)
+
+    async def delete_messages(self, messages):
+        return None
+
+    def get_partial_message(self, mid: int):
+        return FakeSent(self)
+
+
+class FakeUser:
+    def __init__(self, uid: int):
+        self.id = uid
+        self.bot = False
+        self.name = f"user{uid}"
+        self.display_name = self.name
+        self.mention = f"<@{uid}>"
+
+
+class FakeMessage:
+    __slots__ = ("id", "channel", "guild", "author", "content", "_state")
+
+    def __init__(self, channel: FakeChannel, author: FakeUser, content: str):
+        self.id = next(_ids)
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self._state = None
+
+    async def add_reaction(self, emoji):
+        return None
+
+    async def delete(self):
+        return None
+
+
+def load_bot():
+    """Import bot.py with a fake logged-in user so handlers can run offline."""
+    import bot as botmod
+
+    botmod.bot._connection.user = types.SimpleNamespace(id=1, bot=True)
+    return botmod
+
+
+def new_loop() -> asyncio.AbstractEventLoop:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return loop
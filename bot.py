@@ -3,16 +3,37 @@
 import os
 import re
 import json
+import time
+import gzip
+import hashlib
+import heapq
+import shutil
+import signal
+import string
+import sys
+import sqlite3
 import asyncio
+import bisect
+import functools
+import math
+import threading
 import contextlib
+import itertools
+import logging
+import operator
 import random
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List, Tuple
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple, Callable, Hashable
 
+import aiohttp
+from aiohttp import web
 import discord
 from discord.ext import commands
 from discord import app_commands
 
+BOOT_STARTED = time.perf_counter()
+
 TOKEN = os.getenv("DISCORD_TOKEN")
 if not TOKEN:
     raise RuntimeError("Set DISCORD_TOKEN in your env")
@@ -22,101 +43,1352 @@ intents.message_content = True
 intents.guilds = True
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
 # -------------------------------------------------
-# load banter.json
+# low-memory profile (PRIZO_LOW_MEMORY=1): no member chunking or member cache
+# and no message cache. Nothing here needs either; the few member lookups go
+# through MEMBERS (a small LRU that fetches on demand).
+# -------------------------------------------------
+LOW_MEMORY = os.getenv("PRIZO_LOW_MEMORY") == "1"
+MAX_MESSAGES = int(os.getenv("PRIZO_MAX_MESSAGES", "0" if LOW_MEMORY else "1000")) or None
+if LOW_MEMORY:
+    # only chunking and member events need it; both are off in this profile
+    intents.members = False
+
+# -------------------------------------------------
+# sharding: PRIZO_SHARD_COUNT turns on AutoShardedBot; PRIZO_SHARD_IDS ("0-3" or
+# "4,5") makes this process own just that range, so several workers can split
+# the guilds and share one local store
+# -------------------------------------------------
+
+
+def parse_shard_ids(spec: str) -> Optional[List[int]]:
+    ids: List[int] = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        lo, _, hi = part.partition("-")
+        ids.extend(range(int(lo), int(hi or lo) + 1))
+    return ids or None
+
+
+SHARD_COUNT: Optional[int] = int(os.getenv("PRIZO_SHARD_COUNT", "0")) or None
+SHARD_IDS: Optional[List[int]] = parse_shard_ids(os.getenv("PRIZO_SHARD_IDS", ""))
+SHARDED = SHARD_COUNT is not None or os.getenv("PRIZO_AUTOSHARD") == "1"
+if SHARD_IDS and SHARD_COUNT is None:
+    raise RuntimeError("PRIZO_SHARD_IDS needs PRIZO_SHARD_COUNT")
+
+
+def shard_of(gid: int) -> int:
+    # Discord's routing: (guild_id >> 22) % shard_count
+    return (gid >> 22) % SHARD_COUNT if SHARD_COUNT else 0
+
+
+def owns_guild(gid: int) -> bool:
+    return SHARD_IDS is None or shard_of(gid) in SHARD_IDS
+
+
+class PrizoBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    async def setup_hook(self) -> None:
+        # catch up on anything logged after the last snapshot (a crash between flushes)
+        replayed = replay_event_log()
+        if replayed:
+            print(f"[events] replayed {replayed} event(s) from {EVENT_LOG_PATH}")
+        self.loop.create_task(event_log_loop())
+        # write-behind flusher for the state store
+        self.loop.create_task(state_flush_loop())
+        # the one task that fires every deadline (mini-game timeouts, ...)
+        self.loop.create_task(timer_loop())
+        # banter/funfacts edits go live without a restart
+        self.loop.create_task(content_reload_loop())
+        await start_ticket_queue()
+        self.loop.create_task(archive_worker())
+        self.loop.create_task(loop_lag_monitor())
+        await start_metrics_server()
+        # Procfile workers get SIGTERM on restart; close cleanly so state is flushed
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            self.loop.add_signal_handler(signal.SIGTERM, lambda: self.loop.create_task(self.close()))
+
+    async def close(self) -> None:
+        try:
+            await flush_state()
+        except Exception as e:
+            print(f"[store] final flush failed: {e}")
+        try:
+            await EVENTS.flush()
+        except Exception as e:
+            print(f"[events] final write failed: {e}")
+        EVENTS.close()
+        await super().close()
+        STORE.close()
+
+
+PREFIX = "!"
+bot_options: Dict[str, Any] = {"max_messages": MAX_MESSAGES}
+if LOW_MEMORY:
+    bot_options["member_cache_flags"] = discord.MemberCacheFlags.none()
+    bot_options["chunk_guilds_at_startup"] = False
+if SHARDED:
+    bot_options.update(shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+bot = PrizoBot(command_prefix=PREFIX, intents=intents, **bot_options)
+# -------------------------------------------------
+# content: banter.json / funfacts.json
 # -------------------------------------------------
-BANTER: Dict[str, List[str]] = {}
-if os.path.exists("banter.json"):
+CONTENT_RELOAD_SECONDS = float(os.getenv("PRIZO_CONTENT_RELOAD_SECONDS", "10"))
+
+
+class ContentError(Exception):
+    pass
+
+
+def parse_content_file(path: str, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, List[str]]:
+    """Parse and validate a {key: [lines]} JSON file.
+
+    One level of nesting is allowed and flattened to dotted keys
+    ("funny": {"69": [...]} -> "funny.69"). For files whose lines are
+    .format()ed, `fields` are the only {placeholders} a line may use; None
+    (lines sent as they are) skips the check, so braces are plain text.
+    Raises ContentError naming the exact line/key at fault.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read()
     try:
-        with open("banter.json", "r", encoding="utf-8") as f:
-            BANTER = json.load(f)
-        print("[banter] loaded.")
-    except Exception as e:
-        print(f"[banter] failed to load: {e}")
+        data = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ContentError(f"{path}:{e.lineno}:{e.colno}: {e.msg}") from None
+    if not isinstance(data, dict):
+        raise ContentError(f"{path}: top level must be an object, got {type(data).__name__}")
+
+    out: Dict[str, List[str]] = {}
+
+    def add(key: str, lines: Any) -> None:
+        if not isinstance(lines, list):
+            raise ContentError(f"{path}: {key} must be a list of strings, got {type(lines).__name__}")
+        for i, line in enumerate(lines):
+            if not isinstance(line, str) or not line.strip():
+                raise ContentError(f"{path}: {key}[{i}] must be a non-empty string")
+            if fields is None:
+                continue
+            try:
+                names = {name for _, name, _, _ in string.Formatter().parse(line) if name is not None}
+            except ValueError as e:
+                raise ContentError(f"{path}: {key}[{i}]: {e}") from None
+            if names - set(fields):
+                raise ContentError(f"{path}: {key}[{i}] uses unknown placeholder(s) {sorted(names - set(fields))}")
+        out[key] = lines
+
+    for key, value in data.items():
+        if isinstance(value, dict):
+            for sub, lines in value.items():
+                add(f"{key}.{sub}", lines)
+        else:
+            add(key, value)
+    return out
+
+
+class ContentFile:
+    """A content file parsed once and served from per-key shuffle bags.
+
+    Every line of a key comes out once before any repeats, and a new bag never
+    starts with the line that ended the last one. reload() re-parses in a
+    worker thread only when the mtime changed and swaps the data in one step;
+    a broken edit is reported and the previous content keeps serving.
+    """
+
+    def __init__(self, path: str, fields: Optional[Tuple[str, ...]] = None):
+        self.path = path
+        self.fields = fields
+        self.mtime_ns: Optional[int] = None
+        self.data: Dict[str, List[str]] = {}
+        self._bags: Dict[str, List[str]] = {}
+        self._last: Dict[str, str] = {}
+
+    def _swap(self, data: Dict[str, List[str]], mtime_ns: int) -> None:
+        self.data = data
+        self._bags = {}
+        self.mtime_ns = mtime_ns
+
+    def load(self) -> None:
+        # blocking; used once at import
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        try:
+            self._swap(parse_content_file(self.path, self.fields), mtime_ns)
+            print(f"[content] {self.path} loaded ({len(self.data)} keys).")
+        except (ContentError, OSError) as e:
+            self.mtime_ns = mtime_ns
+            print(f"[content] {e}")
+
+    async def reload(self) -> bool:
+        try:
+            mtime_ns = (await asyncio.to_thread(os.stat, self.path)).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime_ns == self.mtime_ns:
+            return False
+        try:
+            data = await asyncio.to_thread(parse_content_file, self.path, self.fields)
+        except (ContentError, OSError) as e:
+            # don't retry the same broken file every tick
+            self.mtime_ns = mtime_ns
+            print(f"[content] reload rejected, keeping previous content: {e}")
+            return False
+        self._swap(data, mtime_ns)
+        print(f"[content] {self.path} reloaded ({len(data)} keys).")
+        return True
+
+    def pick(self, key: str, default: str = "") -> str:
+        bag = self._bags.get(key)
+        if not bag:
+            lines = self.data.get(key)
+            if not lines:
+                return default
+            bag = self._bags[key] = lines[:]
+            random.shuffle(bag)
+            # lines are popped from the end
+            if len(bag) > 1 and bag[-1] == self._last.get(key):
+                bag[0], bag[-1] = bag[-1], bag[0]
+        line = self._last[key] = bag.pop()
+        return line
+
+
+BANTER = ContentFile("banter.json")                   # sent verbatim, never formatted
+FUNFACTS = ContentFile("funfacts.json", fields=("n",))
+CONTENT_FILES = (BANTER, FUNFACTS)
+for _content in CONTENT_FILES:
+    _content.load()
+
+
+async def content_reload_loop() -> None:
+    while True:
+        await asyncio.sleep(CONTENT_RELOAD_SECONDS)
+        for content in CONTENT_FILES:
+            try:
+                await content.reload()
+            except Exception as e:
+                print(f"[content] reload of {content.path} failed: {e}")
 
 
-def arm_new_lucky(st: Dict[str, Any]) -> int:
+def arm_new_lucky(st: "GuildState") -> int:
     # pick a lucky number within N steps from the current count
-    return st["current_number"] + random.randint(st["lucky_min"], st["lucky_max"])
+    return st.current_number + random.randint(st.lucky_min, st.lucky_max)
 
 
 def pick_banter(key: str, default: str = "") -> str:
-    arr = BANTER.get(key) or []
-    if not arr:
-        return default
-    return random.choice(arr)
+    return BANTER.pick(key, default)
 
 
 # -------------------------------------------------
-# load banter.json (only for word numbers)
+# metrics (Prometheus text on PRIZO_METRICS_HOST:PRIZO_METRICS_PORT/metrics)
+# hot paths only bump preallocated slots; everything else is computed per scrape
 # -------------------------------------------------
-COUNT_CFG: Dict[str, Any] = {
-    "word_numbers": {}
+METRICS_HOST = os.getenv("PRIZO_METRICS_HOST", "127.0.0.1")
+
+
+def _metrics_port() -> int:
+    # 0 turns the endpoint off. Shard workers on one host would all fight for
+    # the same port, so for them it is a base: each serves on base + its
+    # first shard id (9108, 9109, ... for one shard per worker).
+    port = int(os.getenv("PRIZO_METRICS_PORT", "9108"))
+    if port and SHARD_IDS:
+        port += SHARD_IDS[0]
+    return port
+
+
+METRICS_PORT = _metrics_port()
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, out: List[str]) -> None:
+        out.append(f"# TYPE {name} histogram")
+        acc = 0
+        for bound, n in zip(self.bounds, self.counts):
+            acc += n
+            out.append(f'{name}_bucket{{le="{bound}"}} {acc}')
+        out.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        out.append(f"{name}_sum {self.sum}")
+        out.append(f"{name}_count {self.count}")
+
+
+# message outcomes are indexed by the COUNT_* constants (see counting handler)
+MSG_OUTCOME_LABELS = ("ignored", "locked", "double", "wrong", "wrong", "counted")
+MSG_OUTCOMES = [0] * len(MSG_OUTCOME_LABELS)
+METRICS: Dict[str, int] = {
+    "minigames_started": 0,
+    "minigames_solved": 0,
+    "minigames_timed_out": 0,
+    "tickets_created": 0,
+    "tickets_failed": 0,
+    "flood_dropped": 0,
+    "messages_purged": 0,
+    "outbox_posts": 0,     # messages the bot asked to send
+    "outbox_sends": 0,     # REST calls they went out in
+    "acks_sent": 0,
+    "acks_skipped": 0,
+    "ack_summaries": 0,
+    "rate_limited": 0,     # 429s discord.py reported
 }
-if os.path.exists("banter.json"):
+H_ON_MESSAGE = Histogram()
+H_QUICK_MATH = Histogram()
+H_CREATE_TICKET = Histogram()
+LOOP_LAG = [0.0]
+
+
+async def loop_lag_monitor() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(1.0)
+        LOOP_LAG[0] = max(0.0, loop.time() - t0 - 1.0)
+
+
+def state_memory_bytes() -> int:
+    # shallow sizes of the per-guild containers; good enough to watch growth
+    total = sys.getsizeof(GUILDS)
+    for st in GUILDS.values():
+        total += sys.getsizeof(st)
+        if st.locks:
+            total += sys.getsizeof(st.locks)
+        if st.wrong_streak:
+            total += sys.getsizeof(st.wrong_streak) + sum(map(sys.getsizeof, st.wrong_streak.values()))
+        if st._tourney_wins is not None:
+            total += sys.getsizeof(st._tourney_wins.wins)
+        if st._tickets is not None:
+            total += sys.getsizeof(st._tickets.records)
+    return total
+
+
+def render_metrics() -> str:
+    out: List[str] = []
+
+    def gauge(name: str, value: Any, help_text: str) -> None:
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} gauge")
+        out.append(f"{name} {value}")
+
+    out.append("# HELP prizo_messages_total Counting-channel messages by outcome.")
+    out.append("# TYPE prizo_messages_total counter")
+    by_label: Dict[str, int] = {}
+    for label, n in zip(MSG_OUTCOME_LABELS, MSG_OUTCOMES):
+        by_label[label] = by_label.get(label, 0) + n
+    for label, n in by_label.items():
+        out.append(f'prizo_messages_total{{outcome="{label}"}} {n}')
+
+    for key, n in METRICS.items():
+        out.append(f"# TYPE prizo_{key}_total counter")
+        out.append(f"prizo_{key}_total {n}")
+
+    H_ON_MESSAGE.render("prizo_on_message_seconds", out)
+    H_QUICK_MATH.render("prizo_run_quick_math_seconds", out)
+    H_CREATE_TICKET.render("prizo_create_winner_ticket_seconds", out)
+
+    latency = bot.latency
+    gauge("prizo_gateway_latency_seconds", latency if latency == latency and latency != float("inf") else 0,
+          "Heartbeat latency to the gateway.")
+    gauge("prizo_event_loop_lag_seconds", LOOP_LAG[0], "How late a 1s sleep woke up.")
+    gauge("prizo_guilds", len(bot.guilds), "Guilds this process is in.")
+    gauge("prizo_guild_states", len(GUILDS), "Guild states held in memory.")
+    gauge("prizo_member_cache_entries", len(MEMBERS), "Members held by the on-demand member cache.")
+    gauge("prizo_state_memory_bytes", state_memory_bytes(), "Approximate size of in-memory guild state.")
+    gauge("prizo_ticket_queue_depth", TICKET_QUEUE.qsize(), "Ticket jobs waiting for a worker.")
+    gauge("prizo_archive_queue_depth", ARCHIVE_QUEUE.qsize(), "Closed tickets waiting to be archived.")
+    gauge("prizo_outbox_queue_depth", outbox_depth(), "Bot messages waiting in per-channel outboxes.")
+    gauge("prizo_outbox_channels", len(OUTBOXES), "Channels with messages waiting to be sent.")
+    gauge("prizo_outbox_sends_per_second", outbox_send_rate(),
+          f"Outbox sends per second over the last {OUTBOX_RATE_SECONDS:.0f}s.")
+    out.append("# HELP prizo_ack_channels Counting channels by the ack mode in effect.")
+    out.append("# TYPE prizo_ack_channels gauge")
+    in_effect = dict.fromkeys(ACK_MODES[1:], 0)
+    for cid in ACK_LOAD:
+        st = GUILDS.get(counting_guild(cid) or 0)
+        if st is not None:
+            in_effect[ack_mode(st, cid)] += 1
+    for mode, n in in_effect.items():
+        out.append(f'prizo_ack_channels{{mode="{mode}"}} {n}')
+    out.append("# TYPE prizo_timers gauge")
+    for kind in TIMER_HANDLERS:
+        out.append(f'prizo_timers{{kind="{kind}"}} {TIMERS.count(kind)}')
+    return "\n".join(out) + "\n"
+
+
+async def start_metrics_server() -> None:
+    if not METRICS_PORT:
+        return
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
     try:
-        with open("banter.json", "r", encoding="utf-8") as f:
-            loaded = json.load(f)
-            COUNT_CFG["word_numbers"] = loaded.get("word_numbers", {})
-        print("[banter] loaded.")
-    except Exception as e:
-        print(f"[banter] failed to load: {e}")
+        await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+        print(f"[metrics] serving on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    except OSError as e:
+        print(f"[metrics] could not bind {METRICS_HOST}:{METRICS_PORT}: {e}")
 
-WORD_NUMBERS: Dict[str, int] = COUNT_CFG.get("word_numbers", {})
 
 # -------------------------------------------------
 # in-memory state
 # -------------------------------------------------
-GUILDS: Dict[int, Dict[str, Any]] = {}
+GUILDS: Dict[int, "GuildState"] = {}
 TICKET_CFG: Dict[int, Dict[str, Optional[int]]] = {}          # guild_id -> {category_id, staff_role_id}
 ai_helper_enabled: Dict[int, bool] = {}
 ai_idle_minutes: Dict[int, int] = {}
 
+# channel_id -> guild_id for every channel where counting is on
+COUNTING_CHANNELS: Dict[int, int] = {}
+# guilds with at least one entry in COUNTING_CHANNELS. A guild that has never
+# registered a channel counts in every channel, as the bot always did; once
+# it registers one, messages anywhere else are ignored before they touch
+# guild state.
+REGISTERED_GUILDS: set = set()
+
+
+def register_counting_channel(cid: int, gid: int) -> None:
+    COUNTING_CHANNELS[cid] = gid
+    REGISTERED_GUILDS.add(gid)
+
+
+def unregister_counting_channel(cid: int) -> Optional[int]:
+    gid = COUNTING_CHANNELS.pop(cid, None)
+    if gid is not None and gid not in COUNTING_CHANNELS.values():
+        # its last channel is gone: back to counting everywhere
+        REGISTERED_GUILDS.discard(gid)
+    return gid
+
+
+def counting_guild(cid: int) -> Optional[int]:
+    gid = COUNTING_CHANNELS.get(cid)
+    if gid is None:
+        channel = bot.get_channel(cid)
+        guild = getattr(channel, "guild", None)
+        if guild is not None and guild.id not in REGISTERED_GUILDS:
+            gid = guild.id
+    return gid
+
+
+# write-behind: mutations only mark the guild dirty, the flusher batches the writes
+DIRTY_GUILDS: set = set()
+DIRTY_CFG: set = set()
+DIRTY_TICKETS: Dict[Tuple[int, int], Any] = {}     # (guild_id, seq) -> TicketRecord
+
 INT_STRICT = re.compile(r"^\s*(-?\d+)\s*$")
 INT_LOOSE = re.compile(r"^\s*(-?\d+)\b")
 
 
-def get_state(gid: int) -> Dict[str, Any]:
-    if gid not in GUILDS:
-        # defaults
-        GUILDS[gid] = {
-            "current_number": 0,
-            "last_user_id": None,
-            "words_only": False,
-            "ban_minutes": 5,
-            "wrong_streak": {},
-            "locks": {},
-            "tickets": [],
-            "lucky_prize": "Lucky number mini-game prize",
-
-            # dynamic lucky
-            "lucky_min": 10,
-            "lucky_max": 100,
-            "lucky_target": None,
-
-            # dynamic milestone
-            "milestone_min": 20,
-            "milestone_max": 150,
-            "next_milestone": None,
-
-            # 🏁 tourney
-            "tourney_mode": False,
-            "tourney_wins": {},      # user_id -> wins
-            "tourney_rounds": 0,     # how many mini-games have happened
-            "tourney_trigger": 5,    # not required now, but handy if you want "every 5"
-        }
-    st = GUILDS[gid]
-
-    # ensure targets exist
-    if st.get("lucky_target") is None:
-        st["lucky_target"] = arm_new_lucky(st)
-    if st.get("next_milestone") is None:
-        st["next_milestone"] = random.randint(st["milestone_min"], st["milestone_max"])
+# -------------------------------------------------
+# tournament leaderboard
+# -------------------------------------------------
+class Leaderboard:
+    """Win counts kept in rank order as they change.
+
+    Users live in one bucket per win count (insertion-ordered, so ties rank
+    whoever got there first higher) and `_levels` keeps the non-empty counts
+    sorted. A win moves one user up one bucket: O(log n). Reading k rows from
+    an offset skips whole buckets by size and then steps into the first bucket
+    it needs with islice: O(levels + skipped ties + k), no sorting. Ties are
+    the common case (most players have one win), so the skip inside a bucket
+    runs in C rather than in Python.
+    """
+
+    __slots__ = ("wins", "_buckets", "_levels")
+
+    def __init__(self, wins: Optional[Dict[int, int]] = None):
+        self.wins: Dict[int, int] = {}
+        self._buckets: Dict[int, Dict[int, None]] = {}
+        self._levels: List[int] = []   # ascending
+        for uid, n in (wins or {}).items():
+            self.wins[uid] = n
+            self._enter(uid, n)
+
+    def __len__(self) -> int:
+        return len(self.wins)
+
+    def _enter(self, uid: int, n: int) -> None:
+        bucket = self._buckets.get(n)
+        if bucket is None:
+            bucket = self._buckets[n] = {}
+            bisect.insort(self._levels, n)
+        bucket[uid] = None
+
+    def _leave(self, uid: int, n: int) -> None:
+        bucket = self._buckets[n]
+        del bucket[uid]
+        if not bucket:
+            del self._buckets[n]
+            del self._levels[bisect.bisect_left(self._levels, n)]
+
+    def add_win(self, uid: int) -> int:
+        n = self.wins.get(uid, 0)
+        if n:
+            self._leave(uid, n)
+        self.wins[uid] = n + 1
+        self._enter(uid, n + 1)
+        return n + 1
+
+    def page(self, start: int, count: int) -> List[Tuple[int, int, int]]:
+        """(rank, user_id, wins) rows for ranks start+1 .. start+count."""
+        rows: List[Tuple[int, int, int]] = []
+        rank = 0
+        for n in reversed(self._levels):
+            bucket = self._buckets[n]
+            if rank + len(bucket) <= start:
+                rank += len(bucket)
+                continue
+            skip = max(0, start - rank)
+            rank += skip
+            for uid in itertools.islice(bucket, skip, skip + count - len(rows)):
+                rank += 1
+                rows.append((rank, uid, n))
+            if len(rows) == count:
+                return rows
+        return rows
+
+    def top(self, count: int) -> List[Tuple[int, int, int]]:
+        return self.page(0, count)
+
+
+# -------------------------------------------------
+# ticket ledger
+# -------------------------------------------------
+TICKETS_PAGE_SIZE = 20
+
+
+class TicketRecord:
+    __slots__ = ("seq", "user_id", "prize", "number", "channel_id", "issued_at", "closed_at")
+
+    def __init__(
+        self,
+        seq: int,
+        user_id: int,
+        prize: str,
+        number: int,
+        channel_id: Optional[int] = None,
+        issued_at: Optional[float] = None,
+        closed_at: Optional[float] = None,
+    ):
+        self.seq = seq
+        self.user_id = user_id
+        self.prize = prize
+        self.number = number
+        self.channel_id = channel_id
+        self.issued_at = time.time() if issued_at is None else issued_at
+        self.closed_at = closed_at
+
+
+class TicketLedger:
+    """Every prize ticket a guild has issued.
+
+    Per-user counts are kept ranked as tickets are issued, so totals are O(1)
+    and a `!tickets` page is O(page); rendered pages are cached until the
+    next ticket changes the ledger.
+    """
+
+    __slots__ = ("gid", "records", "counts", "version", "_pages")
+
+    def __init__(self, gid: int, records: Optional[List[TicketRecord]] = None):
+        self.gid = gid
+        self.records: List[TicketRecord] = []
+        self.counts = Leaderboard()
+        self.version = 0
+        self._pages: Dict[int, str] = {}
+        for rec in records or ():
+            self.records.append(rec)
+            self.counts.add_win(rec.user_id)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, seq: int) -> Optional[TicketRecord]:
+        # seq is 1-based and records are never removed
+        return self.records[seq - 1] if 0 < seq <= len(self.records) else None
+
+    def by_channel(self, channel_id: int) -> Optional[TicketRecord]:
+        for rec in reversed(self.records):
+            if rec.channel_id == channel_id:
+                return rec
+        return None
+
+    def open_records(self, issued_before: float) -> List[TicketRecord]:
+        return [
+            rec for rec in self.records
+            if rec.channel_id and rec.closed_at is None and rec.issued_at < issued_before
+        ]
+
+    def user_total(self, uid: int) -> int:
+        return self.counts.wins.get(uid, 0)
+
+    def issue(self, user_id: int, prize: str, number: int, channel_id: Optional[int] = None) -> TicketRecord:
+        rec = TicketRecord(len(self.records) + 1, user_id, prize, number, channel_id)
+        self.records.append(rec)
+        self.counts.add_win(user_id)
+        self.touch(rec)
+        return rec
+
+    def touch(self, rec: TicketRecord) -> None:
+        # record changed (new, channel attached, closed): persist it and drop cached pages
+        DIRTY_TICKETS[(self.gid, rec.seq)] = rec
+        self.version += 1
+        self._pages.clear()
+
+    def pages(self) -> int:
+        return max(1, -(-len(self.counts) // TICKETS_PAGE_SIZE))
+
+    def render_page(self, page: int) -> str:
+        text = self._pages.get(page)
+        if text is None:
+            lines = [
+                f"**{rank}.** <@{uid}>: **{cnt}** ticket(s)"
+                for rank, uid, cnt in self.counts.page((page - 1) * TICKETS_PAGE_SIZE, TICKETS_PAGE_SIZE)
+            ]
+            text = self._pages[page] = "\n".join(lines)
+        return text
+
+
+def ticket_row(gid: int, rec: TicketRecord) -> Tuple:
+    return (gid, rec.seq, rec.user_id, rec.prize, rec.number, rec.channel_id, rec.issued_at, rec.closed_at)
+
+
+def read_ticket_ledger(gid: int) -> TicketLedger:
+    return TicketLedger(gid, [TicketRecord(*row) for row in STORE.load_tickets(gid)])
+
+
+# -------------------------------------------------
+# guild state: one slotted record per guild. The parts most guilds never use
+# (bench locks, wrong streaks, the tourney board, the ticket ledger) stay None
+# until first needed, so a quiet guild is one small object.
+# -------------------------------------------------
+class GuildState:
+    __slots__ = (
+        "gid",
+        "current_number", "last_user_id", "words_only", "ban_minutes",
+        "locks", "wrong_streak",
+        "lucky_prize", "lucky_min", "lucky_max", "lucky_target",
+        "milestone_min", "milestone_max", "next_milestone",
+        "tourney_mode", "tourney_rounds", "tourney_trigger",
+        "ack_mode",
+        "_tourney_wins", "_tickets",
+    )
+
+    # plain values, written to and read from the snapshot as they are
+    SCALARS = (
+        "current_number", "last_user_id", "words_only", "ban_minutes",
+        "lucky_prize", "lucky_min", "lucky_max", "lucky_target",
+        "milestone_min", "milestone_max", "next_milestone",
+        "tourney_mode", "tourney_rounds", "tourney_trigger",
+        "ack_mode",
+    )
+
+    def __init__(self, gid: int):
+        self.gid = gid
+        self.current_number = 0
+        self.last_user_id: Optional[int] = None
+        self.words_only = False
+        self.ban_minutes = 5
+        self.locks: Optional[Dict[int, float]] = None                  # user_id -> benched until (epoch)
+        self.wrong_streak: Optional[Dict[int, Dict[int, int]]] = None  # channel_id -> user_id -> misses
+        self.lucky_prize = "Lucky number mini-game prize"
+
+        # dynamic lucky
+        self.lucky_min = 10
+        self.lucky_max = 100
+        self.lucky_target: Optional[int] = None
+
+        # dynamic milestone
+        self.milestone_min = 20
+        self.milestone_max = 150
+        self.next_milestone: Optional[int] = None
+
+        # 🏁 tourney
+        self.tourney_mode = False
+        self.tourney_rounds = 0     # how many mini-games have happened
+        self.tourney_trigger = 5    # not required now, but handy if you want "every 5"
+        self._tourney_wins: Optional[Leaderboard] = None
+        self._tickets: Optional[TicketLedger] = None
+
+        self.ack_mode = "auto"      # ✅/⛔ reactions, see ACK_MODES
+
+    @property
+    def tourney_wins(self) -> Leaderboard:
+        # user_id -> wins, kept ranked
+        if self._tourney_wins is None:
+            self._tourney_wins = Leaderboard()
+        return self._tourney_wins
+
+    @tourney_wins.setter
+    def tourney_wins(self, board: Optional[Leaderboard]) -> None:
+        self._tourney_wins = board
+
+    @property
+    def tickets(self) -> TicketLedger:
+        # sync access for boot-time replay; async code goes through ticket_ledger()
+        if self._tickets is None:
+            self._tickets = read_ticket_ledger(self.gid)
+        return self._tickets
+
+    async def ticket_ledger(self) -> TicketLedger:
+        # the first win or command after boot reads the ledger on a worker
+        # thread: tens of thousands of rows, and the store lock may be held
+        # by a flush
+        if self._tickets is None:
+            ledger = await asyncio.to_thread(read_ticket_ledger, self.gid)
+            if self._tickets is None:
+                self._tickets = ledger
+        return self._tickets
+
+    def to_json(self) -> Dict[str, Any]:
+        data = dict(zip(self.SCALARS, _guild_scalars(self)))
+        # JSON has no int keys; tickets have their own table
+        if self.locks:
+            data["locks"] = {str(uid): until for uid, until in self.locks.items()}
+        if self.wrong_streak:
+            data["wrong_streak"] = {
+                f"{cid}:{uid}": n for cid, users in self.wrong_streak.items() for uid, n in users.items()
+            }
+        if self._tourney_wins:
+            data["tourney_wins"] = {str(uid): n for uid, n in self._tourney_wins.wins.items()}
+        return data
+
+    @classmethod
+    def from_json(cls, gid: int, data: Dict[str, Any]) -> "GuildState":
+        st = cls(gid)
+        for name in cls.SCALARS:
+            if name in data:
+                setattr(st, name, data[name])
+        if data.get("locks"):
+            st.locks = {int(uid): _epoch(until) for uid, until in data["locks"].items()}
+        if data.get("wrong_streak"):
+            st.wrong_streak = {}
+            for key, n in data["wrong_streak"].items():
+                cid, uid = key.split(":")
+                st.wrong_streak.setdefault(int(cid), {})[int(uid)] = n
+        if data.get("tourney_wins"):
+            st._tourney_wins = Leaderboard({int(uid): n for uid, n in data["tourney_wins"].items()})
+        return st
+
+
+_guild_scalars = operator.attrgetter(*GuildState.SCALARS)
+
+
+def _epoch(value: Any) -> float:
+    # older snapshots stored bench locks as naive UTC ISO strings
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+    return float(value)
+
+
+# -------------------------------------------------
+# persistent store (SQLite, WAL)
+# -------------------------------------------------
+DB_PATH = os.getenv("PRIZO_DB", "prizo.db")
+FLUSH_SECONDS = float(os.getenv("PRIZO_FLUSH_SECONDS", "2"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_state (
+    guild_id INTEGER PRIMARY KEY,
+    data     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS guild_config (
+    guild_id             INTEGER PRIMARY KEY,
+    ticket_category_id   INTEGER,
+    ticket_staff_role_id INTEGER,
+    ai_enabled           INTEGER,
+    ai_idle_minutes      INTEGER
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    guild_id   INTEGER NOT NULL,
+    seq        INTEGER NOT NULL,
+    user_id    INTEGER NOT NULL,
+    prize      TEXT,
+    number     INTEGER,
+    channel_id INTEGER,
+    issued_at  REAL NOT NULL,
+    closed_at  REAL,
+    PRIMARY KEY (guild_id, seq)
+);
+CREATE TABLE IF NOT EXISTS ticket_jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id    INTEGER NOT NULL,
+    ticket_seq  INTEGER NOT NULL,
+    user_id     INTEGER NOT NULL,
+    prize       TEXT,
+    number      INTEGER,
+    channel_id  INTEGER,
+    message_id  INTEGER,
+    announce    TEXT,
+    user_name   TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS counting_channels (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id   INTEGER NOT NULL
+);
+"""
+
+
+class StateStore:
+    def __init__(self, path: str):
+        # one connection shared between the loop (reads) and the flusher thread (writes)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            # several shard processes may share the file; wait out each other's commits
+            self.db.execute("PRAGMA busy_timeout=5000")
+            self.db.executescript(SCHEMA)
+
+    def load_guild(self, gid: int) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.db.execute("SELECT data FROM guild_state WHERE guild_id = ?", (gid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_config(self) -> List[Tuple[int, Optional[int], Optional[int], Optional[int], Optional[int]]]:
+        with self.lock:
+            return self.db.execute(
+                "SELECT guild_id, ticket_category_id, ticket_staff_role_id, ai_enabled, ai_idle_minutes "
+                "FROM guild_config"
+            ).fetchall()
+
+    def load_tickets(self, gid: int) -> List[Tuple]:
+        with self.lock:
+            return self.db.execute(
+                "SELECT seq, user_id, prize, number, channel_id, issued_at, closed_at "
+                "FROM tickets WHERE guild_id = ? ORDER BY seq",
+                (gid,),
+            ).fetchall()
+
+    def write_batch(
+        self,
+        state_rows: List[Tuple[int, str]],
+        cfg_rows: List[Tuple],
+        ticket_rows: List[Tuple] = (),
+        meta_rows: List[Tuple[str, str]] = (),
+    ) -> None:
+        # runs in a worker thread; one transaction per flush
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                if state_rows:
+                    self.db.executemany(
+                        "INSERT INTO guild_state (guild_id, data) VALUES (?, ?) "
+                        "ON CONFLICT(guild_id) DO UPDATE SET data = excluded.data",
+                        state_rows,
+                    )
+                if cfg_rows:
+                    self.db.executemany(
+                        "INSERT INTO guild_config "
+                        "(guild_id, ticket_category_id, ticket_staff_role_id, ai_enabled, ai_idle_minutes) "
+                        "VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(guild_id) DO UPDATE SET "
+                        "ticket_category_id = excluded.ticket_category_id, "
+                        "ticket_staff_role_id = excluded.ticket_staff_role_id, "
+                        "ai_enabled = excluded.ai_enabled, "
+                        "ai_idle_minutes = excluded.ai_idle_minutes",
+                        cfg_rows,
+                    )
+                if ticket_rows:
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO tickets "
+                        "(guild_id, seq, user_id, prize, number, channel_id, issued_at, closed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        ticket_rows,
+                    )
+                if meta_rows:
+                    self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta_rows)
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def add_ticket_job(self, row: Tuple) -> int:
+        with self.lock:
+            cur = self.db.execute(
+                "INSERT INTO ticket_jobs "
+                "(guild_id, ticket_seq, user_id, prize, number, channel_id, message_id, announce, user_name, attempts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            return cur.lastrowid
+
+    def update_ticket_job(self, job_id: int, attempts: Optional[int]) -> None:
+        # attempts=None means the job is finished (done or given up)
+        with self.lock:
+            if attempts is None:
+                self.db.execute("DELETE FROM ticket_jobs WHERE id = ?", (job_id,))
+            else:
+                self.db.execute("UPDATE ticket_jobs SET attempts = ? WHERE id = ?", (attempts, job_id))
+
+    def set_ticket_job_message(self, job_id: int, message_id: int) -> None:
+        with self.lock:
+            self.db.execute("UPDATE ticket_jobs SET message_id = ? WHERE id = ?", (message_id, job_id))
+
+    def load_ticket_jobs(self) -> List[Tuple]:
+        with self.lock:
+            return self.db.execute(
+                "SELECT id, guild_id, ticket_seq, user_id, prize, number, channel_id, message_id, announce, "
+                "user_name, attempts "
+                "FROM ticket_jobs ORDER BY id"
+            ).fetchall()
+
+    def load_meta(self, prefix: str) -> Dict[str, str]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT key, value FROM meta WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff")
+            ).fetchall()
+        return dict(rows)
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def load_counting_channels(self) -> List[Tuple[int, int]]:
+        with self.lock:
+            return self.db.execute("SELECT channel_id, guild_id FROM counting_channels").fetchall()
+
+    def set_counting_channel(self, channel_id: int, gid: Optional[int]) -> None:
+        # gid=None removes the channel
+        with self.lock:
+            if gid is None:
+                self.db.execute("DELETE FROM counting_channels WHERE channel_id = ?", (channel_id,))
+            else:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO counting_channels (channel_id, guild_id) VALUES (?, ?)",
+                    (channel_id, gid),
+                )
+
+    def close(self) -> None:
+        with self.lock:
+            with contextlib.suppress(Exception):
+                self.db.close()
+
+
+def state_to_json(st: GuildState) -> Dict[str, Any]:
+    data = st.to_json()
+    # every event up to here is reflected in this snapshot
+    data["event_seq"] = EVENTS.seq
+    return data
+
+
+def config_row(gid: int) -> Tuple:
+    cat_id, staff_role_id = get_ticket_cfg(gid)
+    enabled = ai_helper_enabled.get(gid)
+    return (
+        gid,
+        cat_id,
+        staff_role_id,
+        None if enabled is None else int(enabled),
+        ai_idle_minutes.get(gid),
+    )
+
+
+STORE = StateStore(DB_PATH)
+
+# each process only keeps the guilds its shards own; the rest belong to other workers
+for _gid, _cat, _staff, _ai_on, _ai_idle in STORE.load_config():
+    if not owns_guild(_gid):
+        continue
+    TICKET_CFG[_gid] = {"category_id": _cat, "staff_role_id": _staff}
+    if _ai_on is not None:
+        ai_helper_enabled[_gid] = bool(_ai_on)
+    if _ai_idle is not None:
+        ai_idle_minutes[_gid] = _ai_idle
+for _cid, _gid in STORE.load_counting_channels():
+    if owns_guild(_gid):
+        register_counting_channel(_cid, _gid)
+if SHARD_IDS is not None:
+    print(f"[shard] this worker owns shard(s) {SHARD_IDS} of {SHARD_COUNT}")
+print(
+    f"[store] {DB_PATH}: config for {len(TICKET_CFG)} guild(s), {len(COUNTING_CHANNELS)} counting channel(s) "
+    f"in {len(REGISTERED_GUILDS)} guild(s) loaded; other guilds count in every channel."
+)
+
+
+# -------------------------------------------------
+# event log: every state change is appended to a JSONL log so recovery and
+# audits can rebuild state from the latest snapshot plus the log tail, without
+# the Discord API. emit() only appends to a buffer; event_log_loop group-commits
+# it from a worker thread. Full segments are sealed as
+# <name>.<first>-<last>.jsonl.gz.
+# -------------------------------------------------
+def _default_event_log() -> str:
+    # shard workers share a directory but each needs its own log
+    if SHARD_IDS:
+        return f"events.shard{SHARD_IDS[0]}-{SHARD_IDS[-1]}.jsonl"
+    return "events.jsonl"
+
+
+EVENT_LOG_PATH = os.getenv("PRIZO_EVENT_LOG", _default_event_log())   # empty turns it off
+EVENT_LOG_FLUSH_SECONDS = 0.25
+EVENT_LOG_SEGMENT_BYTES = int(os.getenv("PRIZO_EVENT_LOG_SEGMENT_MB", "64")) << 20
+EVENT_SEQ_META = f"event_seq:{os.path.basename(EVENT_LOG_PATH)}"
+_EVENT_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class EventLog:
+    """Append-only JSONL event log with group commit and gzipped segments.
+
+    Every event carries a seq that only grows across restarts and rotations;
+    guild snapshots record the seq they include, so replay is idempotent.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.enabled = bool(path)
+        self.seq = 0
+        self._buf: List[Tuple[int, float, int, str, Dict[str, Any]]] = []
+        self._file = None
+        self._first = 0       # first seq in the active segment, 0 while it is empty
+        self._lock = asyncio.Lock()
+        stem = os.path.basename(path)
+        stem = stem[:-6] if stem.endswith(".jsonl") else stem
+        self._dir = os.path.dirname(os.path.abspath(path)) if path else ""
+        self._stem = stem
+        self._segment_re = re.compile(re.escape(stem) + r"\.(\d+)-(\d+)\.jsonl(\.gz)?$")
+
+    def emit(self, gid: int, kind: str, **fields: Any) -> None:
+        # hot path: no I/O, no serialising
+        if not self.enabled:
+            return
+        self.seq += 1
+        self._buf.append((self.seq, time.time(), gid, kind, fields))
+
+    def pending(self) -> int:
+        return len(self._buf)
+
+    # ---- segments ----
+    def segments(self) -> List[Tuple[int, int, str]]:
+        """Sealed segments as (first_seq, last_seq, path), oldest first."""
+        out = []
+        with contextlib.suppress(FileNotFoundError):
+            for name in os.listdir(self._dir):
+                m = self._segment_re.match(name)
+                if m:
+                    out.append((int(m.group(1)), int(m.group(2)), os.path.join(self._dir, name)))
+        out.sort()
+        return out
+
+    def open(self, floor: int) -> None:
+        """Resume numbering after everything logged or snapshotted (blocking, boot only)."""
+        if not self.enabled:
+            return
+        last = floor
+        for first, seg_last, path in self.segments():
+            last = max(last, seg_last)
+            if not path.endswith(".gz"):
+                # sealed but not compressed when the process died
+                self._compress(path)
+        first, tail = self._active_bounds()
+        self._first = first
+        self.seq = max(last, tail)
+
+    def _active_bounds(self) -> Tuple[int, int]:
+        try:
+            f = open(self.path, "r+b")
+        except FileNotFoundError:
+            return 0, 0
+        with f:
+            size = f.seek(0, 2)
+            f.seek(max(0, size - 65536))
+            chunk = f.read()
+            # drop a half-written last line so the next append starts clean
+            cut = chunk.rfind(b"\n") + 1
+            if cut < len(chunk):
+                f.truncate(size - (len(chunk) - cut))
+                chunk = chunk[:cut]
+            lines = chunk.splitlines()
+            f.seek(0)
+            head = f.readline()
+        if not lines:
+            return 0, 0
+        first = json.loads(head)["seq"] if head.endswith(b"\n") else 0
+        return first, json.loads(lines[-1])["seq"]
+
+    # ---- writer (worker thread) ----
+    def _write(self, batch: List[Tuple[int, float, int, str, Dict[str, Any]]]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        # the fixed head is formatted directly; only the event's own fields go through json
+        enc = _EVENT_ENCODER
+        self._file.write("".join(
+            f'{{"seq":{seq},"ts":{ts:.3f},"g":{gid},"e":"{kind}"{"," + enc(fields)[1:] if fields else "}"}\n'
+            for seq, ts, gid, kind, fields in batch
+        ))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if not self._first:
+            self._first = batch[0][0]
+        if self._file.tell() >= EVENT_LOG_SEGMENT_BYTES:
+            self._rotate(batch[-1][0])
+
+    def _rotate(self, last: int) -> None:
+        self._file.close()
+        self._file = None
+        sealed = os.path.join(self._dir, f"{self._stem}.{self._first}-{last}.jsonl")
+        os.replace(self.path, sealed)
+        self._first = 0
+        self._compress(sealed)
+
+    @staticmethod
+    def _compress(path: str) -> None:
+        with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._buf:
+                return
+            batch, self._buf = self._buf, []
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception:
+                # keep order: the failed batch goes back in front of newer events
+                self._buf[:0] = batch
+                raise
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # ---- reading ----
+    def read(self, since: int = 0):
+        """Yield logged events with seq > since, oldest first."""
+        for _, last, path in self.segments():
+            if last > since:
+                yield from self._read_file(path, since)
+        yield from self._read_file(self.path, since)
+
+    @staticmethod
+    def _read_file(path: str, since: int):
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        ev = json.loads(line)
+                    except ValueError:
+                        continue   # torn tail from a crash
+                    if ev["seq"] > since:
+                        yield ev
+        except FileNotFoundError:
+            return
+
+
+EVENTS = EventLog(EVENT_LOG_PATH)
+EVENTS.open(int(STORE.load_meta(EVENT_SEQ_META).get(EVENT_SEQ_META, 0)))
+
+
+async def event_log_loop() -> None:
+    while True:
+        await asyncio.sleep(EVENT_LOG_FLUSH_SECONDS)
+        try:
+            await EVENTS.flush()
+        except Exception as e:
+            print(f"[events] write failed (will retry): {type(e).__name__}: {e}")
+
+
+# replay: event kind -> fn(gid, st, event); each one redoes what the live code did
+def _ev_count(gid: int, st: GuildState, ev: Dict[str, Any]) -> None:
+    st.current_number = ev["n"]
+    st.last_user_id = ev["u"]
+
+
+def _ev_reset(gid: int, st: GuildState, ev: Dict[str, Any]) -> None:
+    st.current_number = 0
+    st.last_user_id = None
+
+
+def _ev_bench(gid: int, st: GuildState, ev: Dict[str, Any]) -> None:
+    if st.locks is None:
+        st.locks = {}
+    st.locks[ev["u"]] = _epoch(ev["until"])
+
+
+def _ev_lucky(gid: int, st: GuildState, ev: Dict[str, Any]) -> None:
+    st.lucky_target = ev["target"]
+
+
+def _ev_milestone(gid: int, st: GuildState, ev: Dict[str, Any]) -> None:
+    st.next_milestone = ev["target"]
+
+
+def _ev_win(gid: int, st: GuildState, ev: Dict[str, Any]) -> None:
+    if ev.get("tourney"):
+        st.tourney_rounds = st.tourney_rounds + 1
+        st.tourney_wins.add_win(ev["u"])
+
 
+def _ev_ticket(gid: int, st: GuildState, ev: Dict[str, Any]) -> None:
+    ledger = st.tickets
+    if ev["ticket"] != len(ledger) + 1:
+        return   # already in the tickets table
+    rec = TicketRecord(ev["ticket"], ev["u"], ev["prize"], ev["n"], issued_at=ev["ts"])
+    ledger.records.append(rec)
+    ledger.counts.add_win(rec.user_id)
+    ledger.touch(rec)
+
+
+def _ev_tourney(gid: int, st: GuildState, ev: Dict[str, Any]) -> None:
+    st.tourney_mode = ev["on"]
+    st.tourney_wins = None
+    st.tourney_rounds = 0
+
+
+def _ev_config(gid: int, st: GuildState, ev: Dict[str, Any]) -> None:
+    key, value = ev["key"], ev["value"]
+    if key in ("category_id", "staff_role_id"):
+        set_ticket_cfg(gid, **{key: value})
+    elif key == "ai_helper":
+        ai_helper_enabled[gid] = value
+        DIRTY_CFG.add(gid)
+    elif key == "ai_idle_minutes":
+        ai_idle_minutes[gid] = value
+        DIRTY_CFG.add(gid)
+    elif key in GuildState.SCALARS:
+        setattr(st, key, value)
+    # counting channels are written straight to the store; logged for audits only
+
+
+EVENT_APPLY: Dict[str, Callable[[int, GuildState, Dict[str, Any]], None]] = {
+    "count": _ev_count,
+    "reset": _ev_reset,
+    "bench": _ev_bench,
+    "lucky": _ev_lucky,
+    "milestone": _ev_milestone,
+    "win": _ev_win,
+    "ticket": _ev_ticket,
+    "tourney": _ev_tourney,
+    "config": _ev_config,
+}
+
+
+def replay_event_log() -> int:
+    """Bring GUILDS up to date with events logged after the last snapshot.
+
+    Each guild's snapshot records the last seq it includes, so events it
+    already has are skipped. Returns how many events were applied.
+    """
+    since = int(STORE.load_meta(EVENT_SEQ_META).get(EVENT_SEQ_META, 0))
+    snap_seq: Dict[int, int] = {}
+    applied = 0
+    enabled, EVENTS.enabled = EVENTS.enabled, False   # replaying must not log again
+    try:
+        for ev in EVENTS.read(since):
+            gid = ev["g"]
+            if not owns_guild(gid):
+                continue
+            if gid not in snap_seq:
+                saved = STORE.load_guild(gid) or {}
+                snap_seq[gid] = saved.get("event_seq", 0)
+            if ev["seq"] <= snap_seq[gid]:
+                continue
+            EVENT_APPLY[ev["e"]](gid, get_state(gid), ev)
+            DIRTY_GUILDS.add(gid)
+            applied += 1
+    finally:
+        EVENTS.enabled = enabled
+    # a log that ends mid-game (lucky target disarmed) has no game to finish
+    # after a restart: arm the targets again, and log that
+    for gid in snap_seq:
+        st = GUILDS.get(gid)
+        if st is not None and ensure_targets(gid, st):
+            DIRTY_GUILDS.add(gid)
+    return applied
+
+
+_flush_lock = asyncio.Lock()
+
+
+async def flush_state() -> None:
+    async with _flush_lock:
+        if not DIRTY_GUILDS and not DIRTY_CFG and not DIRTY_TICKETS:
+            return
+        gids = list(DIRTY_GUILDS)
+        cfg_gids = list(DIRTY_CFG)
+        tickets = dict(DIRTY_TICKETS)
+        DIRTY_GUILDS.clear()
+        DIRTY_CFG.clear()
+        DIRTY_TICKETS.clear()
+
+        # serialise on the loop (no awaits, so nothing mutates underneath), write in a thread
+        state_rows = [(gid, json.dumps(state_to_json(GUILDS[gid]))) for gid in gids if gid in GUILDS]
+        cfg_rows = [config_row(gid) for gid in cfg_gids]
+        ticket_rows = [ticket_row(gid, rec) for (gid, _), rec in tickets.items()]
+        # once this commits, no snapshot is missing an event at or below this seq
+        meta_rows = [(EVENT_SEQ_META, str(EVENTS.seq))] if EVENTS.enabled else []
+        try:
+            await asyncio.to_thread(STORE.write_batch, state_rows, cfg_rows, ticket_rows, meta_rows)
+        except Exception:
+            # keep them dirty so the next flush retries
+            DIRTY_GUILDS.update(gids)
+            DIRTY_CFG.update(cfg_gids)
+            for key, rec in tickets.items():
+                DIRTY_TICKETS.setdefault(key, rec)
+            raise
+
+
+async def state_flush_loop() -> None:
+    while True:
+        await asyncio.sleep(FLUSH_SECONDS)
+        try:
+            await flush_state()
+        except Exception as e:
+            print(f"[store] flush failed: {e}")
+
+
+def get_state(gid: int) -> GuildState:
+    st = GUILDS.get(gid)
+    if st is not None:
+        return st
+
+    saved = STORE.load_guild(gid)
+    if saved:
+        st = GuildState.from_json(gid, saved)
+        schedule_state_expiry(gid, st)
+    else:
+        st = GuildState(gid)
+
+    # ensure targets exist (only on first load, not on every access)
+    ensure_targets(gid, st)
+    GUILDS[gid] = st
     return st
 
 
+def ensure_targets(gid: int, st: GuildState) -> bool:
+    # a target is only None while a mini-game runs; on load there is no game
+    armed = False
+    if st.lucky_target is None:
+        st.lucky_target = arm_new_lucky(st)
+        EVENTS.emit(gid, "lucky", target=st.lucky_target)
+        armed = True
+    if st.next_milestone is None:
+        st.next_milestone = random.randint(st.milestone_min, st.milestone_max)
+        EVENTS.emit(gid, "milestone", target=st.next_milestone)
+        armed = True
+    return armed
+
+
 
 def get_ticket_cfg(gid: int) -> Tuple[Optional[int], Optional[int]]:
     cfg = TICKET_CFG.get(gid) or {}
@@ -130,6 +1402,8 @@ def set_ticket_cfg(gid: int, category_id: Optional[int] = None, staff_role_id: O
     if staff_role_id is not None:
         cfg["staff_role_id"] = staff_role_id
     TICKET_CFG[gid] = cfg
+    DIRTY_CFG.add(gid)
+    invalidate_ticket_target(gid)
 
 
 def extract_int(text: str, strict: bool) -> Optional[int]:
@@ -137,31 +1411,547 @@ def extract_int(text: str, strict: bool) -> Optional[int]:
     return int(m.group(1)) if m else None
 
 
+# -------------------------------------------------
+# word numbers ("five hundred and one", "twenty-one", "two_thousand")
+# -------------------------------------------------
+WORD_SPLIT = re.compile(r"[\s_\-]+")
+WORD_ONES = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9,
+}
+WORD_TEENS = {
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+WORD_TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+WORD_SCALES = {
+    "thousand": 10 ** 3, "million": 10 ** 6, "billion": 10 ** 9, "trillion": 10 ** 12,
+}
+
+
+def parse_number_words(text: str) -> Optional[int]:
+    """Parse an English number written in words, one pass over the tokens.
+
+    Accepts spaces, hyphens, underscores and "and" between words. Returns None
+    for anything that is not exactly one well-formed number ("one two",
+    "thousand million", "hello").
+    """
+    total = 0        # everything already closed off by a scale word
+    hundreds = 0     # "five hundred" part of the current group
+    sub = 0          # 0-99 part of the current group
+    last = ""        # kind of the previous token
+    last_scale = 0
+    seen = False
+
+    for tok in WORD_SPLIT.split(text.strip().lower()):
+        if not tok or tok == "and":
+            continue
+        if tok == "zero":
+            if seen:
+                return None
+            last = "zero"
+            seen = True
+            continue
+        if last == "zero":
+            return None
+        seen = True
+
+        v = WORD_ONES.get(tok)
+        if v is not None:
+            if last in ("one", "teen"):
+                return None
+            sub += v
+            last = "one"
+            continue
+        v = WORD_TEENS.get(tok)
+        if v is None:
+            v = WORD_TENS.get(tok)
+            kind = "tens"
+        else:
+            kind = "teen"
+        if v is not None:
+            if last in ("one", "teen", "tens"):
+                return None
+            sub += v
+            last = kind
+            continue
+        if tok == "hundred":
+            if hundreds or not sub:
+                return None
+            hundreds, sub = sub * 100, 0
+            last = "hundred"
+            continue
+        v = WORD_SCALES.get(tok)
+        if v is not None:
+            group = hundreds + sub
+            if not group or (last_scale and v >= last_scale):
+                return None
+            total += group * v
+            hundreds = sub = 0
+            last_scale = v
+            last = "scale"
+            continue
+        return None
+
+    if not seen:
+        return None
+    return total + hundreds + sub
+
+
+# -------------------------------------------------
+# timers: one heap + one task for every deadline in the bot
+# -------------------------------------------------
+class TimerHeap:
+    """Min-heap of deadlines keyed by tuples whose first item is the timer kind.
+
+    Scheduling a key again replaces its deadline; the old heap entry is left
+    behind and skipped when it surfaces (and compacted away if they pile up),
+    so schedule/cancel stay O(log n) / O(1).
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, Tuple]] = []
+        self._due: Dict[Tuple, float] = {}
+        self._kinds: Dict[Hashable, int] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, key: Tuple) -> bool:
+        return key in self._due
+
+    def count(self, kind: Hashable) -> int:
+        # live entries of one kind, e.g. TIMERS.count("lock")
+        return self._kinds.get(kind, 0)
+
+    def _forget(self, key: Tuple) -> None:
+        del self._due[key]
+        self._kinds[key[0]] -= 1
+
+    def schedule(self, key: Tuple, when: float) -> None:
+        if key not in self._due:
+            self._kinds[key[0]] = self._kinds.get(key[0], 0) + 1
+        self._due[key] = when
+        heapq.heappush(self._heap, (when, next(self._seq), key))
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(w, next(self._seq), k) for k, w in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def cancel(self, key: Tuple) -> None:
+        if key in self._due:
+            self._forget(key)
+
+    def next_deadline(self) -> Optional[float]:
+        heap = self._heap
+        while heap and self._due.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now: float) -> List[Tuple]:
+        heap = self._heap
+        fired = []
+        while heap and heap[0][0] <= now:
+            when, _, key = heapq.heappop(heap)
+            if self._due.get(key) == when:
+                self._forget(key)
+                fired.append(key)
+        return fired
+
+
+# keys are tuples whose first item picks the handler, e.g. ("game", channel_id)
+TIMERS = TimerHeap()
+TIMER_HANDLERS: Dict[str, Callable[[Tuple], None]] = {}
+_timer_wake = asyncio.Event()
+_timer_sleep_until = float("inf")
+
+
+def schedule_timer(key: Tuple, when: float) -> None:
+    TIMERS.schedule(key, when)
+    # only wake the timer task if this deadline is earlier than what it sleeps for
+    if when < _timer_sleep_until:
+        _timer_wake.set()
+
+
+async def timer_loop() -> None:
+    global _timer_sleep_until
+    while True:
+        for key in TIMERS.pop_due(time.time()):
+            try:
+                TIMER_HANDLERS[key[0]](key)
+            except Exception as e:
+                print(f"[timers] {key[0]} handler failed: {type(e).__name__}: {e}")
+
+        nxt = TIMERS.next_deadline()
+        _timer_sleep_until = float("inf") if nxt is None else nxt
+        _timer_wake.clear()
+        delay = 3600.0 if nxt is None else max(0.0, nxt - time.time())
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(_timer_wake.wait(), delay)
+
+
+# -------------------------------------------------
+# bench locks / wrong streaks: evicted by the timer heap so a guild's state
+# only holds users who are benched or miscounted recently
+# -------------------------------------------------
+WRONG_STREAK_TTL = 3600.0   # a streak nobody extends for an hour is forgotten
+
+
+def bench_user(st: GuildState, gid: int, uid: int) -> None:
+    until = time.time() + st.ban_minutes * 60
+    if st.locks is None:
+        st.locks = {}
+    st.locks[uid] = until
+    EVENTS.emit(gid, "bench", u=uid, until=until)
+    schedule_timer(("lock", gid, uid), until)
+
+
+def drop_lock(st: GuildState, uid: int) -> bool:
+    if not st.locks or st.locks.pop(uid, None) is None:
+        return False
+    if not st.locks:
+        st.locks = None
+    return True
+
+
+def bump_wrong_streak(st: GuildState, gid: int, cid: int, uid: int) -> int:
+    if st.wrong_streak is None:
+        st.wrong_streak = {}
+    users = st.wrong_streak.setdefault(cid, {})
+    n = users[uid] = users.get(uid, 0) + 1
+    schedule_timer(("streak", gid, cid, uid), time.time() + WRONG_STREAK_TTL)
+    return n
+
+
+def drop_wrong_streak(st: GuildState, cid: int, uid: int) -> bool:
+    users = st.wrong_streak.get(cid) if st.wrong_streak else None
+    if not users or users.pop(uid, None) is None:
+        return False
+    if not users:
+        del st.wrong_streak[cid]
+        if not st.wrong_streak:
+            st.wrong_streak = None
+    return True
+
+
+def clear_wrong_streak(st: GuildState, gid: int, cid: int, uid: int) -> None:
+    if drop_wrong_streak(st, cid, uid):
+        TIMERS.cancel(("streak", gid, cid, uid))
+
+
+def schedule_state_expiry(gid: int, st: GuildState) -> None:
+    # re-register deadlines for state that came back from the store
+    for uid, until in (st.locks or {}).items():
+        schedule_timer(("lock", gid, uid), until)
+    now = time.time()
+    for cid, users in (st.wrong_streak or {}).items():
+        for uid in users:
+            schedule_timer(("streak", gid, cid, uid), now + WRONG_STREAK_TTL)
+
+
+def _lock_expired(key: Tuple) -> None:
+    _, gid, uid = key
+    st = GUILDS.get(gid)
+    if st is not None and drop_lock(st, uid):
+        DIRTY_GUILDS.add(gid)
+
+
+def _streak_expired(key: Tuple) -> None:
+    _, gid, cid, uid = key
+    st = GUILDS.get(gid)
+    if st is not None and drop_wrong_streak(st, cid, uid):
+        DIRTY_GUILDS.add(gid)
+
+
+TIMER_HANDLERS["lock"] = _lock_expired
+TIMER_HANDLERS["streak"] = _streak_expired
+
+
+# -------------------------------------------------
+# number classification (fun facts)
+# -------------------------------------------------
+PRIME_SIEVE_MAX = int(os.getenv("PRIZO_PRIME_SIEVE_MAX", str(1 << 25)))
+_MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+
+def _miller_rabin(n: int) -> bool:
+    # deterministic for n < 3.3e24 with these bases
+    d, r = n - 1, 0
+    while not d & 1:
+        d >>= 1
+        r += 1
+    for a in _MR_BASES:
+        if a % n == 0:
+            return True
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(r - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+# bit k of a byte, for packing a segment of 0/1 bytes eight to a byte
+_BIT_TABLES = [bytes.maketrans(b"\x00\x01", bytes((0, 1 << k))) for k in range(8)]
+
+
+class PrimeSieve:
+    """Odd-only prime bitset (one bit per odd number) that grows as counts climb.
+
+    When a count gets within a quarter of the limit, a sieve twice as large is
+    built in a worker thread and swapped in; until then (and past
+    PRIME_SIEVE_MAX) Miller-Rabin answers, so is_prime never blocks the loop.
+    The build sieves one segment at a time and packs it, so it never holds
+    more than the bitset plus one segment.
+    """
+
+    SEGMENT = 1 << 18   # odd numbers per build segment; a multiple of 8
+
+    def __init__(self, limit: int = 1 << 16):
+        self.limit = limit
+        self.bits = self._build(limit)
+        self._growing = False
+
+    @classmethod
+    def _build(cls, limit: int) -> bytearray:
+        size = limit // 2 + 1          # odd index i <-> 2i + 1
+        root = math.isqrt(limit)
+        base = bytearray(b"\x01") * (root + 1)
+        for p in range(3, math.isqrt(root) + 1, 2):
+            if base[p]:
+                base[p * p::2 * p] = bytes(len(range(p * p, root + 1, 2 * p)))
+        primes = [p for p in range(3, root + 1, 2) if base[p]]
+
+        bits = bytearray()
+        for lo in range(0, size, cls.SEGMENT):
+            n = min(cls.SEGMENT, size - lo)
+            seg = bytearray(b"\x01") * n
+            if lo == 0:
+                seg[0] = 0             # 1 is not prime
+            for p in primes:
+                first = (p * p) >> 1
+                if first >= lo + n:
+                    break
+                start = first - lo if first >= lo else (first - lo) % p
+                seg[start::p] = bytes(len(range(start, n, p)))
+            seg += bytes(-n % 8)
+            packed = 0
+            for k in range(8):
+                packed |= int.from_bytes(seg[k::8].translate(_BIT_TABLES[k]), "little")
+            bits += packed.to_bytes(len(seg) // 8, "little")
+        return bits
+
+    def _install(self, limit: int, bits: bytearray) -> None:
+        if limit > self.limit:
+            self.bits = bits
+            self.limit = limit
+        self._growing = False
+
+    def _grow(self, n: int) -> None:
+        target = self.limit
+        while target < 2 * n:
+            target *= 2
+        target = min(target, PRIME_SIEVE_MAX)
+        if target <= self.limit:
+            return
+        self._growing = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._install(target, self._build(target))
+            return
+        fut = loop.run_in_executor(None, self._build, target)
+        fut.add_done_callback(
+            lambda f: self._install(target, f.result()) if not f.exception() else self._install(0, b"")
+        )
+
+    def is_prime(self, n: int) -> bool:
+        if n < 2:
+            return False
+        if not n & 1:
+            return n == 2
+        if not self._growing and 4 * n > 3 * self.limit and self.limit < PRIME_SIEVE_MAX:
+            self._grow(n)
+        if n <= self.limit:
+            i = n >> 1
+            return (self.bits[i >> 3] >> (i & 7)) & 1 == 1
+        return _miller_rabin(n)
+
+
+PRIMES = PrimeSieve()
+
+# (funfacts.json key, test) in priority order; the first category with content wins
+NUMBER_CATEGORIES: List[Tuple[str, Callable[[int], bool]]] = []
+
+
+def number_category(key: str):
+    def register(fn: Callable[[int], bool]) -> Callable[[int], bool]:
+        NUMBER_CATEGORIES.append((key, fn))
+        classify_number.cache_clear()
+        return fn
+    return register
+
+
+@functools.lru_cache(maxsize=4096)
+def classify_number(n: int) -> Tuple[str, ...]:
+    return tuple(key for key, test in NUMBER_CATEGORIES if test(n))
+
+
+# the number itself or a count ending in it (169, 1420, 2777), not every
+# count with the digits somewhere in it
+for _digits in ("69", "420", "777", "999"):
+    number_category(f"funny.{_digits}")(lambda n, m=10 ** len(_digits), r=int(_digits): n % m == r)
+
+
+@number_category("prime")
+def _is_prime(n: int) -> bool:
+    return PRIMES.is_prime(n)
+
+
+@number_category("palindrome")
+def _is_palindrome(n: int) -> bool:
+    # single digits are trivially palindromes, not fun
+    s = str(n)
+    return n > 9 and s == s[::-1]
+
+
+@number_category("multiple10")
+def _is_multiple10(n: int) -> bool:
+    return n > 0 and n % 10 == 0
+
+
+# one fun fact per channel per cooldown, however many counts qualify
+FUNFACT_COOLDOWN = float(os.getenv("PRIZO_FUNFACT_COOLDOWN", "30"))
+FUNFACT_LAST: Dict[int, float] = {}   # channel_id -> when its last fun fact went out
+
+
+def pick_fun_fact(n: int, cid: Optional[int] = None) -> Optional[str]:
+    if cid is not None:
+        now = time.monotonic()
+        if now - FUNFACT_LAST.get(cid, -FUNFACT_COOLDOWN) < FUNFACT_COOLDOWN:
+            return None
+    for key in classify_number(n):
+        line = FUNFACTS.pick(key)
+        if line:
+            if cid is not None:
+                FUNFACT_LAST[cid] = now
+            return line.format(n=n)
+    return None
+
+
+# -------------------------------------------------
+# member lookups: guild.get_member when the member cache has them, otherwise a
+# small LRU of fetched members with a TTL (misses are cached briefly too).
+# Concurrent lookups of the same member share one fetch_member call.
+# -------------------------------------------------
+MEMBER_CACHE_SIZE = int(os.getenv("PRIZO_MEMBER_CACHE", "2048"))
+MEMBER_TTL = 600.0
+MEMBER_MISS_TTL = 60.0
+
+
+class MemberResolver:
+    def __init__(self, size: int, ttl: float, miss_ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        # (guild_id, user_id) -> (expires, member or None for "not in the guild")
+        self._cache: "OrderedDict[Tuple[int, int], Tuple[float, Optional[discord.Member]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[int, int], asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _hit(self, key: Tuple[int, int]) -> Optional[Tuple[float, Optional[discord.Member]]]:
+        hit = self._cache.get(key)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return hit
+
+    def peek(self, guild: discord.Guild, uid: int) -> Optional[discord.Member]:
+        """Cached member or None; never calls the API."""
+        member = guild.get_member(uid)
+        if member is not None:
+            return member
+        hit = self._hit((guild.id, uid))
+        return hit[1] if hit else None
+
+    async def resolve(self, guild: discord.Guild, uid: int) -> Optional[discord.Member]:
+        """Member, fetched if needed; None if they are not in the guild."""
+        member = guild.get_member(uid)
+        if member is not None:
+            return member
+        key = (guild.id, uid)
+        hit = self._hit(key)
+        if hit is not None:
+            return hit[1]
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = self._inflight[key] = asyncio.ensure_future(self._fetch(guild, key))
+        # shielded: one caller giving up must not cancel the fetch the others wait on
+        return await asyncio.shield(fut)
+
+    async def _fetch(self, guild: discord.Guild, key: Tuple[int, int]) -> Optional[discord.Member]:
+        try:
+            try:
+                member = await guild.fetch_member(key[1])
+                ttl = self.ttl
+            except discord.NotFound:
+                member, ttl = None, self.miss_ttl
+            self._cache[key] = (time.monotonic() + ttl, member)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+            return member
+        finally:
+            self._inflight.pop(key, None)
+
+
+MEMBERS = MemberResolver(MEMBER_CACHE_SIZE, MEMBER_TTL, MEMBER_MISS_TTL)
+
+
 # -------------------------------------------------
 # ticket creation
 # -------------------------------------------------
-async def create_winner_ticket(
-    guild: discord.Guild,
-    winner: discord.Member,
-    prize: str,
-    n_hit: int
-) -> Optional[discord.TextChannel]:
+# guild_id -> (category, overwrites minus the winner, config problems); built
+# once per guild, dropped when the config, the category or the staff role changes
+TICKET_TARGETS: Dict[int, Tuple[Optional[discord.CategoryChannel], Dict[Any, discord.PermissionOverwrite], List[str]]] = {}
+TICKET_CFG_WARNED: set = set()   # guilds whose admins were already told about a broken config
+
+
+def invalidate_ticket_target(gid: int) -> None:
+    TICKET_TARGETS.pop(gid, None)
+    TICKET_CFG_WARNED.discard(gid)
+
+
+def ticket_target(guild: discord.Guild) -> Tuple[Optional[discord.CategoryChannel], Dict[Any, discord.PermissionOverwrite], List[str]]:
+    cached = TICKET_TARGETS.get(guild.id)
+    if cached is not None:
+        return cached
+
     cat_id, staff_role_id = get_ticket_cfg(guild.id)
+    problems: List[str] = []
     category = guild.get_channel(cat_id) if cat_id else None
+    if cat_id and not isinstance(category, discord.CategoryChannel):
+        category = None
+        problems.append("the ticket category set with `/set_ticket_category` no longer exists")
     staff_role = guild.get_role(staff_role_id) if staff_role_id else None
+    if staff_role_id and staff_role is None:
+        problems.append("the staff role set with `/set_ticket_staff` no longer exists")
 
-    if not isinstance(winner, discord.Member):
-        with contextlib.suppress(Exception):
-            winner = await guild.fetch_member(winner.id)
-
-    # make sure bot + winner can talk
+    # make sure bot + staff can talk; the winner is added per ticket
     overwrites = {
         guild.default_role: discord.PermissionOverwrite(view_channel=False),
-        winner: discord.PermissionOverwrite(
-            view_channel=True,
-            send_messages=True,
-            read_message_history=True
-        ),
         guild.me: discord.PermissionOverwrite(
             view_channel=True,
             send_messages=True,
@@ -178,80 +1968,735 @@ async def create_winner_ticket(
             manage_messages=True,
         )
 
-    name = f"ticket-{winner.name.lower()}-{n_hit}"
+    target = TICKET_TARGETS[guild.id] = (category, overwrites, problems)
+    return target
+
+
+WINNER_OVERWRITE = discord.PermissionOverwrite(
+    view_channel=True,
+    send_messages=True,
+    read_message_history=True
+)
+
+
+async def create_winner_ticket(
+    guild: discord.Guild,
+    winner: discord.abc.Snowflake,
+    prize: str,
+    n_hit: int,
+    winner_name: Optional[str] = None,
+) -> Optional[discord.TextChannel]:
+    # winner can be a bare discord.Object: overwrites only need the id, so no fetch
+    category, base_overwrites, _ = ticket_target(guild)
+    overwrites = dict(base_overwrites)
+    overwrites[winner] = WINNER_OVERWRITE
+
+    name = f"ticket-{(winner_name or getattr(winner, 'name', None) or str(winner.id)).lower()}-{n_hit}"
+
+    # one request: overwrites are sent with the create, so nothing syncs from the parent
+    try:
+        chan = await guild.create_text_channel(
+            name=name,
+            category=category,
+            overwrites=overwrites,
+            reason="Prizo prize ticket",
+        )
+    except discord.Forbidden:
+        # no perms to create channel
+        return None
+
+    # now try to send the embed
+    claim_text = pick_banter("claim", "Please provide your IMVU link and prize details.")
+    em = discord.Embed(
+        title="🎟️ Prize Ticket",
+        description=(
+            f"🎟 Ticket for <@{winner.id}>\n\n"
+            f"Please provide:\n"
+            f"• **IMVU Account Link**\n"
+            f"• **Lucky Number Won:** {n_hit}\n"
+            f"• **Prize:** {prize}\n\n"
+            f"{claim_text}"
+        ),
+        colour=discord.Colour.green()
+    )
+    em.set_footer(text=f"{guild.name} • Ticket")
+
+    try:
+        await chan.send(embed=em)
+    except discord.Forbidden:
+        # at least drop a plain message
+        with contextlib.suppress(Exception):
+            await chan.send(
+                f"<@{winner.id}> ticket created.\nPrize: {prize}\nLucky number: {n_hit}\n{claim_text}"
+            )
+
+    return chan
+
+# -------------------------------------------------
+# ticket queue: winners are announced right away, channels are created in the
+# background with bounded concurrency and retried with backoff
+# -------------------------------------------------
+TICKET_WORKERS = 3
+TICKET_MAX_ATTEMPTS = 8
+TICKET_BACKOFF_MAX = 300.0
+
+
+class TicketJob:
+    __slots__ = (
+        "id", "guild_id", "seq", "user_id", "prize", "number",
+        "channel_id", "message_id", "announce", "user_name", "attempts", "announcement",
+    )
+
+    def __init__(
+        self, id, guild_id, seq, user_id, prize, number, channel_id, message_id, announce, user_name, attempts=0
+    ):
+        self.id = id
+        self.guild_id = guild_id
+        self.seq = seq
+        self.user_id = user_id
+        self.prize = prize
+        self.number = number
+        self.channel_id = channel_id      # where the winner was announced
+        self.message_id = message_id      # the announcement, edited with the link
+        self.announce = announce
+        self.user_name = user_name
+        self.attempts = attempts
+        # in memory only: the winner announcement still being sent
+        self.announcement: Optional[asyncio.Future] = None
+
+
+TICKET_QUEUE: "asyncio.Queue[TicketJob]" = asyncio.Queue()
+TICKET_RETRY: Dict[int, TicketJob] = {}   # job id -> job waiting on its backoff timer
+
+
+def winner_embed(announce: str, footer_line: str) -> discord.Embed:
+    return discord.Embed(
+        title="🏆 Lucky Mini-Game Winner",
+        description=f"{announce}\n{footer_line}",
+        colour=discord.Colour.purple(),
+    )
+
+
+async def enqueue_ticket(job: TicketJob) -> None:
+    job.id = await asyncio.to_thread(
+        STORE.add_ticket_job,
+        (job.guild_id, job.seq, job.user_id, job.prize, job.number,
+         job.channel_id, job.message_id, job.announce, job.user_name, job.attempts),
+    )
+    TICKET_QUEUE.put_nowait(job)
+
+
+def _ticket_retry_due(key: Tuple) -> None:
+    job = TICKET_RETRY.pop(key[1], None)
+    if job is not None:
+        TICKET_QUEUE.put_nowait(job)
+
+
+TIMER_HANDLERS["ticket_retry"] = _ticket_retry_due
+
+
+def ticket_retry_delay(job: TicketJob, error: Exception) -> Optional[float]:
+    """Seconds to wait before retrying, or None if the error is permanent."""
+    if job.attempts >= TICKET_MAX_ATTEMPTS:
+        return None
+    backoff = min(TICKET_BACKOFF_MAX, 2.0 ** job.attempts) + random.uniform(0, 1)
+    if isinstance(error, discord.HTTPException):
+        if error.status == 429:
+            retry_after = getattr(error, "retry_after", None)
+            return max(backoff, float(retry_after or 0))
+        if error.status >= 500:
+            return backoff
+        return None   # 403 / 404 / 400 won't fix themselves
+    if isinstance(error, (OSError, asyncio.TimeoutError, aiohttp.ClientError)):
+        return backoff
+    return None
+
+
+async def _finish_announcement(job: TicketJob, chan: Optional[discord.TextChannel]) -> None:
+    announce_chan = bot.get_channel(job.channel_id)
+    if announce_chan is None:
+        return
+    if job.announcement is not None:
+        # still on its way: wait for it rather than posting a second one
+        with contextlib.suppress(Exception):
+            job.message_id = (await job.announcement).id
+    if chan is not None:
+        view = discord.ui.View()
+        view.add_item(discord.ui.Button(label="🎫 Open Ticket", style=discord.ButtonStyle.link, url=chan.jump_url))
+        claim_banter = pick_banter("claim", "Open your ticket to claim.")
+        result = {"embed": winner_embed(job.announce, claim_banter), "view": view}
+    else:
+        result = {"embed": winner_embed(
+            job.announce, "🎟 I couldn't open a ticket automatically — staff will sort out your prize."
+        )}
+    if job.message_id:
+        await announce_chan.get_partial_message(job.message_id).edit(**result)
+    else:
+        # the announcement never went out: post the result in its place
+        await post(announce_chan, solo=True, **result)
+
+
+async def process_ticket_job(job: TicketJob) -> None:
+    guild = bot.get_guild(job.guild_id)
+    if guild is None:
+        # bot left the guild: nothing to create
+        await asyncio.to_thread(STORE.update_ticket_job, job.id, None)
+        return
+
+    _, _, problems = ticket_target(guild)
+    if problems and guild.id not in TICKET_CFG_WARNED:
+        TICKET_CFG_WARNED.add(guild.id)
+        announce_chan = bot.get_channel(job.channel_id)
+        if announce_chan is not None:
+            with contextlib.suppress(Exception):
+                await announce_chan.send(
+                    "⚠️ Ticket setup needs an admin: " + "; ".join(problems)
+                    + ". Tickets are still being created, without it."
+                )
+
+    job.attempts += 1
+    t0 = time.perf_counter()
+    try:
+        winner = MEMBERS.peek(guild, job.user_id) or discord.Object(id=job.user_id)
+        chan = await create_winner_ticket(
+            guild, winner, prize=job.prize, n_hit=job.number, winner_name=job.user_name
+        )
+    except Exception as e:
+        H_CREATE_TICKET.observe(time.perf_counter() - t0)
+        delay = ticket_retry_delay(job, e)
+        if delay is not None:
+            print(f"[tickets] job {job.id} attempt {job.attempts} failed ({type(e).__name__}: {e}); retry in {delay:.1f}s")
+            await asyncio.to_thread(STORE.update_ticket_job, job.id, job.attempts)
+            TICKET_RETRY[job.id] = job
+            schedule_timer(("ticket_retry", job.id), time.time() + delay)
+            return
+        print(f"[tickets] job {job.id} gave up after {job.attempts} attempt(s): {type(e).__name__}: {e}")
+        chan = None
+    else:
+        H_CREATE_TICKET.observe(time.perf_counter() - t0)
+        if chan is None:
+            print(f"[tickets] job {job.id}: no permission to create the ticket channel")
+
+    if chan is not None:
+        METRICS["tickets_created"] += 1
+        ledger = await get_state(job.guild_id).ticket_ledger()
+        rec = ledger.get(job.seq)
+        if rec is None:
+            # the ledger flush was lost in a crash; the job is the source of truth
+            rec = ledger.issue(job.user_id, job.prize, job.number)
+            EVENTS.emit(job.guild_id, "ticket", ticket=rec.seq, u=rec.user_id, prize=rec.prize, n=rec.number)
+        rec.channel_id = chan.id
+        ledger.touch(rec)
+    else:
+        METRICS["tickets_failed"] += 1
+
+    await asyncio.to_thread(STORE.update_ticket_job, job.id, None)
+    with contextlib.suppress(Exception):
+        await _finish_announcement(job, chan)
+
+
+async def ticket_worker() -> None:
+    while True:
+        job = await TICKET_QUEUE.get()
+        try:
+            await process_ticket_job(job)
+        except Exception as e:
+            print(f"[tickets] worker error on job {job.id}: {type(e).__name__}: {e}")
+        finally:
+            TICKET_QUEUE.task_done()
+
+
+async def start_ticket_queue() -> None:
+    # pick up whatever was pending when the last process stopped
+    for row in await asyncio.to_thread(STORE.load_ticket_jobs):
+        job = TicketJob(*row)
+        if owns_guild(job.guild_id):
+            TICKET_QUEUE.put_nowait(job)
+    if TICKET_QUEUE.qsize():
+        print(f"[tickets] resuming {TICKET_QUEUE.qsize()} pending ticket job(s)")
+    for _ in range(TICKET_WORKERS):
+        asyncio.get_running_loop().create_task(ticket_worker())
+
+
+# -------------------------------------------------
+# ticket archival: transcript to a gzip file, then delete the channel; one
+# paced worker so hundreds of channels never hit the delete rate limit
+# -------------------------------------------------
+ARCHIVE_DIR = os.getenv("PRIZO_TRANSCRIPTS", "transcripts")
+ARCHIVE_DELETE_INTERVAL = 1.0     # seconds between channel deletes
+ARCHIVE_WRITE_BATCH = 200         # transcript lines per write to disk
+
+ARCHIVE_QUEUE: "asyncio.Queue[Tuple[int, int]]" = asyncio.Queue()   # (guild_id, channel_id)
+ARCHIVE_PENDING: set = set()
+
+
+async def write_transcript(chan: discord.TextChannel, header: Tuple[str, ...] = ()) -> str:
+    path = os.path.join(ARCHIVE_DIR, str(chan.guild.id), f"{chan.name}-{chan.id}.txt.gz")
+    await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+    f = await asyncio.to_thread(gzip.open, path, "wt", encoding="utf-8")
+    try:
+        # stream page by page; compression and disk writes happen off the loop
+        buf: List[str] = [f"# {line}" for line in header]
+        async for m in chan.history(limit=None, oldest_first=True):
+            line = f"[{m.created_at:%Y-%m-%d %H:%M:%S}] {m.author} ({m.author.id}): {m.content}"
+            for em in m.embeds:
+                if em.title or em.description:
+                    line += f" [embed] {em.title or ''} {em.description or ''}"
+            for att in m.attachments:
+                line += f" [attachment] {att.url}"
+            buf.append(line)
+            if len(buf) >= ARCHIVE_WRITE_BATCH:
+                await asyncio.to_thread(f.write, "\n".join(buf) + "\n")
+                buf.clear()
+        if buf:
+            await asyncio.to_thread(f.write, "\n".join(buf) + "\n")
+    finally:
+        await asyncio.to_thread(f.close)
+    return path
+
+
+def queue_archive(gid: int, channel_id: int) -> bool:
+    if channel_id in ARCHIVE_PENDING:
+        return False
+    ARCHIVE_PENDING.add(channel_id)
+    ARCHIVE_QUEUE.put_nowait((gid, channel_id))
+    return True
+
+
+def mark_ticket_closed(gid: int, channel_id: int) -> None:
+    ledger: TicketLedger = get_state(gid).tickets
+    rec = ledger.by_channel(channel_id)
+    if rec is not None and rec.closed_at is None:
+        rec.closed_at = time.time()
+        ledger.touch(rec)
+
+
+async def archive_ticket(gid: int, channel_id: int) -> None:
+    ledger = await get_state(gid).ticket_ledger()
+    chan = bot.get_channel(channel_id)
+    if chan is not None:
+        header: Tuple[str, ...] = ()
+        rec = ledger.by_channel(channel_id)
+        if rec is not None:
+            winner = "?"
+            with contextlib.suppress(discord.HTTPException):
+                member = await MEMBERS.resolve(chan.guild, rec.user_id)
+                winner = str(member) if member is not None else "(left the server)"
+            header = (f"ticket #{rec.seq} for {winner} ({rec.user_id}): {rec.prize}, lucky number {rec.number}",)
+        path = await write_transcript(chan, header)
+        await chan.delete(reason="Prizo ticket archived")
+        print(f"[archive] #{chan.name} ({channel_id}) -> {path}")
+    # gone already (deleted by hand) counts as closed too
+    mark_ticket_closed(gid, channel_id)
+
+
+async def archive_worker() -> None:
+    loop = asyncio.get_running_loop()
+    last_delete = 0.0
+    while True:
+        gid, channel_id = await ARCHIVE_QUEUE.get()
+        wait = ARCHIVE_DELETE_INTERVAL - (loop.time() - last_delete)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            await archive_ticket(gid, channel_id)
+            ARCHIVE_PENDING.discard(channel_id)
+        except discord.HTTPException as e:
+            if e.status == 429 or e.status >= 500:
+                # back off and put it at the end of the line
+                await asyncio.sleep(max(ARCHIVE_DELETE_INTERVAL, float(getattr(e, "retry_after", 0) or 0), 5.0))
+                ARCHIVE_QUEUE.put_nowait((gid, channel_id))
+            else:
+                ARCHIVE_PENDING.discard(channel_id)
+                print(f"[archive] channel {channel_id} failed: {type(e).__name__}: {e}")
+        except Exception as e:
+            ARCHIVE_PENDING.discard(channel_id)
+            print(f"[archive] channel {channel_id} failed: {type(e).__name__}: {e}")
+        finally:
+            last_delete = loop.time()
+            ARCHIVE_QUEUE.task_done()
+
+
+# -------------------------------------------------
+# outbound: bot messages to a channel go through that channel's Outbox, which
+# holds them for OUTBOX_WINDOW and while a send is in flight, then sends what
+# has piled up as one message: text lines joined, embeds (up to 10) after
+# them. A lucky hit (line + game embed) or a win ("armed" line + leaderboard)
+# is then one REST call on the channel's rate-limit bucket instead of several.
+# Text queued after an embed starts the next message, so nothing renders out
+# of order. post() returns a future for the Message its item went out in.
+# -------------------------------------------------
+OUTBOX_WINDOW = float(os.getenv("PRIZO_OUTBOX_WINDOW_MS", "50")) / 1000.0
+OUTBOX_MAX_EMBEDS = 10          # Discord limits per message
+OUTBOX_MAX_CONTENT = 2000
+OUTBOX_MAX_EMBED_CHARS = 6000
+OUTBOX_RATE_SECONDS = 10.0      # sends/sec gauge is averaged over this
+
+
+class Outgoing:
+    __slots__ = ("content", "embed", "solo", "kwargs", "future", "queued")
+
+    def __init__(self, content: Optional[str], embed: Optional[discord.Embed], solo: bool,
+                 kwargs: Dict[str, Any], future: asyncio.Future):
+        self.content = content
+        self.embed = embed
+        self.solo = solo
+        self.kwargs = kwargs
+        self.future = future
+        self.queued = time.monotonic()
+
+
+class Outbox:
+    __slots__ = ("channel", "items", "task")
+
+    def __init__(self, channel: discord.abc.Messageable):
+        self.channel = channel
+        self.items: "deque[Outgoing]" = deque()
+        self.task: Optional[asyncio.Task] = None
+
+    def take(self) -> List[Outgoing]:
+        # the longest prefix of the queue that still fits in one message
+        first = self.items.popleft()
+        batch = [first]
+        if first.solo:
+            return batch
+        text = len(first.content or "")
+        embeds = 0 if first.embed is None else 1
+        chars = 0 if first.embed is None else len(first.embed)
+        while self.items:
+            nxt = self.items[0]
+            if nxt.solo:
+                break
+            if nxt.content:
+                # text always renders above embeds
+                if embeds or text + 1 + len(nxt.content) > OUTBOX_MAX_CONTENT:
+                    break
+            if nxt.embed is not None:
+                if embeds >= OUTBOX_MAX_EMBEDS or chars + len(nxt.embed) > OUTBOX_MAX_EMBED_CHARS:
+                    break
+                embeds += 1
+                chars += len(nxt.embed)
+            if nxt.content:
+                text += 1 + len(nxt.content)
+            batch.append(self.items.popleft())
+        return batch
+
+    async def send(self, batch: List[Outgoing]) -> None:
+        kwargs = dict(batch[0].kwargs)
+        lines = [o.content for o in batch if o.content]
+        if lines:
+            kwargs["content"] = "\n".join(lines)
+        embeds = [o.embed for o in batch if o.embed is not None]
+        if embeds:
+            kwargs["embeds"] = embeds
+        try:
+            msg = await self.channel.send(**kwargs)
+        except Exception as e:
+            print(f"[outbox] send to {self.channel.id} failed: {type(e).__name__}: {e}")
+            for o in batch:
+                if not o.future.done():
+                    o.future.set_exception(e)
+            return
+        METRICS["outbox_sends"] += 1
+        note_send()
+        note_latency(self.channel.id, time.monotonic() - batch[0].queued)
+        for o in batch:
+            if not o.future.done():
+                o.future.set_result(msg)
+
+    async def run(self) -> None:
+        try:
+            await asyncio.sleep(OUTBOX_WINDOW)
+            # whatever queues up while a send is in flight goes in the next one
+            while self.items:
+                await self.send(self.take())
+        finally:
+            # send() never raises, so only a cancel leaves items behind; the
+            # next post() starts a new task for them
+            self.task = None
+            if not self.items and OUTBOXES.get(self.channel.id) is self:
+                del OUTBOXES[self.channel.id]
+
+    def start(self) -> None:
+        self.task = asyncio.get_running_loop().create_task(self.run())
+        BACKGROUND_TASKS.add(self.task)
+        self.task.add_done_callback(BACKGROUND_TASKS.discard)
+
+
+OUTBOXES: Dict[int, Outbox] = {}   # channel_id -> outbox; only while it has something to send
+OUTBOX_SEND_TIMES: "deque[float]" = deque()
+
+
+def _retrieved(fut: asyncio.Future) -> None:
+    # fire-and-forget posts: the failure is already logged by the outbox
+    if not fut.cancelled():
+        fut.exception()
+
+
+def post(channel: discord.abc.Messageable, content: Optional[str] = None, *,
+         embed: Optional[discord.Embed] = None, solo: bool = False, **kwargs) -> asyncio.Future:
+    """Queue a message for the channel; the future resolves to the sent Message.
+
+    solo=True (or any other send() keyword, like view=) keeps it in a message
+    of its own, e.g. one that is edited later and must not carry other embeds.
+    """
+    fut = asyncio.get_running_loop().create_future()
+    fut.add_done_callback(_retrieved)
+    box = OUTBOXES.get(channel.id)
+    if box is None:
+        box = OUTBOXES[channel.id] = Outbox(channel)
+    box.items.append(Outgoing(content, embed, solo or bool(kwargs), kwargs, fut))
+    METRICS["outbox_posts"] += 1
+    if box.task is None:
+        box.start()
+    return fut
+
+
+def note_send() -> None:
+    now = time.monotonic()
+    OUTBOX_SEND_TIMES.append(now)
+    while OUTBOX_SEND_TIMES[0] < now - OUTBOX_RATE_SECONDS:
+        OUTBOX_SEND_TIMES.popleft()
+
+
+def outbox_depth() -> int:
+    return sum(len(box.items) for box in OUTBOXES.values())
+
+
+def outbox_send_rate() -> float:
+    cutoff = time.monotonic() - OUTBOX_RATE_SECONDS
+    while OUTBOX_SEND_TIMES and OUTBOX_SEND_TIMES[0] < cutoff:
+        OUTBOX_SEND_TIMES.popleft()
+    return len(OUTBOX_SEND_TIMES) / OUTBOX_RATE_SECONDS
+
+
+# -------------------------------------------------
+# acknowledgements: the ✅/⛔ reaction on a count is one REST call per message
+# on the channel's bucket, the same bucket the announcements wait on. A guild
+# picks an ack mode (/ack_mode):
+#   always    react to every count
+#   adaptive  react only while the channel's earlier reactions are through
+#   summary   no reactions; "count is at N" at most every ACK_SUMMARY_SECONDS
+#   off       no reactions
+#   auto      (default) start at always and move toward summary on a 429 or
+#             slow reactions/sends, one step back per ACK_CALM_SECONDS of calm
+# count_message awaits the reaction last, after every reply is queued on the
+# outbox, so the replies never wait behind it.
+# -------------------------------------------------
+ACK_MODES = ("auto", "always", "adaptive", "summary", "off")
+ACK_LEVELS = ("always", "adaptive", "summary")   # what auto moves between
+ACK_SLOW = 0.75             # seconds; a reaction or outbox send this slow means the bucket is backed up
+ACK_CALM_SECONDS = 60.0
+ACK_SUMMARY_SECONDS = 30.0
+ACK_MAX_INFLIGHT = 2        # adaptive: reactions still on their way before new ones are skipped
+CHANNEL_ROUTE = re.compile(r"/channels/(\d+)")
+
+
+class AckLoad:
+    __slots__ = ("level", "latency", "inflight", "trouble_at", "summarized")
+
+    def __init__(self):
+        self.level = 0              # index into ACK_LEVELS, for auto
+        self.latency = 0.0          # moving average of reaction / outbox send time
+        self.inflight = 0
+        self.trouble_at = 0.0       # monotonic time of the last 429 or slow call
+        self.summarized: Optional[int] = None
+
+    def escalate(self, level: int) -> None:
+        self.level = max(self.level, level)
+        self.trouble_at = time.monotonic()
 
-    try:
-        chan = await guild.create_text_channel(
-            name=name,
-            category=category,
-            overwrites=overwrites,
-            reason="Prizo prize ticket",
-        )
-    except discord.Forbidden:
-        # no perms to create channel
-        return None
+    def current(self) -> str:
+        # one step back toward "always" for every calm period since the last trouble
+        if self.level and time.monotonic() - self.trouble_at > ACK_CALM_SECONDS:
+            self.level -= 1
+            self.latency = 0.0
+            self.trouble_at = time.monotonic()
+        return ACK_LEVELS[self.level]
 
-    # (optional) don’t sync perms from parent if parent blocks us
-    with contextlib.suppress(Exception):
-        await chan.edit(sync_permissions=False)
 
-    # now try to send the embed
-    claim_text = pick_banter("claim", "Please provide your IMVU link and prize details.")
-    em = discord.Embed(
-        title="🎟️ Prize Ticket",
-        description=(
-            f"🎟 Ticket for {winner.mention}\n\n"
-            f"Please provide:\n"
-            f"• **IMVU Account Link**\n"
-            f"• **Lucky Number Won:** {n_hit}\n"
-            f"• **Prize:** {prize}\n\n"
-            f"{claim_text}"
-        ),
-        colour=discord.Colour.green()
-    )
-    em.set_footer(text=f"{guild.name} • Ticket")
+ACK_LOAD: Dict[int, AckLoad] = {}   # channel_id -> load, for counting channels that have acked
+
+
+def ack_mode(st: GuildState, cid: int) -> str:
+    if st.ack_mode != "auto":
+        return st.ack_mode
+    load = ACK_LOAD.get(cid)
+    return load.current() if load is not None else ACK_LEVELS[0]
+
 
+def note_latency(cid: int, seconds: float) -> None:
+    load = ACK_LOAD.get(cid)
+    if load is None:
+        return
+    load.latency = load.latency * 0.8 + seconds * 0.2
+    if load.latency > ACK_SLOW * 4:
+        load.escalate(2)
+    elif load.latency > ACK_SLOW:
+        load.escalate(1)
+
+
+def note_rate_limited(cid: Optional[int]) -> None:
+    METRICS["rate_limited"] += 1
+    load = ACK_LOAD.get(cid) if cid is not None else None
+    if load is not None:
+        load.escalate(2)
+
+
+class RateLimitWatch(logging.Filter):
+    # discord.py retries 429s itself and only logs them; count them on the way past
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING and "429" in str(record.msg):
+            args = record.args if isinstance(record.args, tuple) else ()
+            m = CHANNEL_ROUTE.search(str(args[1])) if len(args) > 1 else None
+            note_rate_limited(int(m.group(1)) if m else None)
+        return True
+
+
+logging.getLogger("discord.http").addFilter(RateLimitWatch())
+
+
+async def acknowledge(message: discord.Message, st: GuildState, emoji: str) -> None:
+    cid = message.channel.id
+    load = ACK_LOAD.get(cid)
+    if load is None:
+        load = ACK_LOAD[cid] = AckLoad()
+    mode = ack_mode(st, cid)
+    if not (mode == "always" or (mode == "adaptive" and load.inflight < ACK_MAX_INFLIGHT)):
+        METRICS["acks_skipped"] += 1
+        if mode == "summary" and ("ack", cid) not in TIMERS:
+            schedule_timer(("ack", cid), time.time() + ACK_SUMMARY_SECONDS)
+        return
+
+    load.inflight += 1
+    t0 = time.monotonic()
     try:
-        await chan.send(embed=em)
-    except discord.Forbidden:
-        # at least drop a plain message
-        with contextlib.suppress(Exception):
-            await chan.send(
-                f"{winner.mention} ticket created.\nPrize: {prize}\nLucky number: {n_hit}\n{claim_text}"
-            )
+        await message.add_reaction(emoji)
+        METRICS["acks_sent"] += 1
+    except discord.RateLimited:
+        note_rate_limited(cid)
+    except discord.HTTPException as e:
+        if e.status == 429:
+            note_rate_limited(cid)
+    except Exception:
+        pass
+    finally:
+        load.inflight -= 1
+        note_latency(cid, time.monotonic() - t0)
+
+
+def _ack_summary_due(key: Tuple) -> None:
+    cid = key[1]
+    gid = counting_guild(cid)
+    load = ACK_LOAD.get(cid)
+    channel = bot.get_channel(cid)
+    if gid is None or load is None or channel is None:
+        return
+    n = get_state(gid).current_number
+    if n and n != load.summarized:
+        load.summarized = n
+        METRICS["ack_summaries"] += 1
+        post(channel, f"🔢 Count is at **{n}**. Next is **{n + 1}**.")
+
+
+TIMER_HANDLERS["ack"] = _ack_summary_due
 
-    return chan
 
 # -------------------------------------------------
 # mini-game: quick math (random ops)
 # -------------------------------------------------
-async def run_quick_math(channel: discord.TextChannel, trigger_user: discord.Member, number_hit: int):
-    import random
+MINIGAME_SECONDS = 15.0
 
-    ops = ["+", "-", "*", "/"]
-    op = random.choice(ops)
 
+def quick_math_question() -> Tuple[str, int]:
+    op = random.choice("+-*/")
     if op == "+":
         a = random.randint(2, 15)
         b = random.randint(2, 15)
-        answer = a + b
-        display = f"{a} + {b}"
-    elif op == "-":
+        return f"{a} + {b}", a + b
+    if op == "-":
         a = random.randint(5, 20)
         b = random.randint(1, a)
-        answer = a - b
-        display = f"{a} - {b}"
-    elif op == "*":
+        return f"{a} - {b}", a - b
+    if op == "*":
         a = random.randint(2, 10)
         b = random.randint(2, 10)
-        answer = a * b
-        display = f"{a} × {b}"
-    else:  # "/"
-        answer = random.randint(2, 12)
-        b = random.randint(2, 12)
-        a = answer * b
-        display = f"{a} / {b}"
+        return f"{a} × {b}", a * b
+    answer = random.randint(2, 12)
+    b = random.randint(2, 12)
+    return f"{answer * b} / {b}", answer
+
+
+class MiniGame:
+    __slots__ = ("display", "answer", "future")
+
+    def __init__(self):
+        self.display, self.answer = quick_math_question()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def offer(self, message: discord.Message) -> bool:
+        # called from on_message for every message in the game's channel
+        if self.future.done() or extract_int(message.content, strict=True) != self.answer:
+            return False
+        self.future.set_result(message)
+        return True
+
+
+# channel_id -> running game; on_message does one dict lookup instead of
+# discord.py running a wait_for check per game against every message. The
+# game is registered by the count that hits the lucky number, before anything
+# awaits, so a channel never has two.
+ACTIVE_GAMES: Dict[int, MiniGame] = {}
+
+
+def _minigame_timeout(key: Tuple) -> None:
+    game = ACTIVE_GAMES.get(key[1])
+    if game is not None and not game.future.done():
+        game.future.set_result(None)
+
+
+TIMER_HANDLERS["game"] = _minigame_timeout
+
+
+BACKGROUND_TASKS: set = set()
+
+
+async def play_minigame(
+    channel: discord.TextChannel, trigger_user: discord.Member, number_hit: int, game: MiniGame
+) -> None:
+    t0 = time.perf_counter()
+    try:
+        await run_quick_math(channel, trigger_user, number_hit, game)
+    except Exception as e:
+        # show the real problem instead of hiding it
+        with contextlib.suppress(Exception):
+            await channel.send(f"⚠️ Mini-game error: `{type(e).__name__}: {e}`")
+    finally:
+        H_QUICK_MATH.observe(time.perf_counter() - t0)
+
 
+async def run_quick_math(
+    channel: discord.TextChannel, trigger_user: discord.Member, number_hit: int, game: MiniGame
+):
+    guild = channel.guild
+    st = get_state(guild.id)
+    try:
+        await _play_quick_math(channel, trigger_user, number_hit, game, st)
+    finally:
+        # ✅ re-arm relative to the current count, whatever happened above, so a
+        # failed send never leaves the guild without a lucky number
+        if st.lucky_target is None:
+            st.lucky_target = arm_new_lucky(st)
+            EVENTS.emit(guild.id, "lucky", target=st.lucky_target)
+            DIRTY_GUILDS.add(guild.id)
+
+    # ❌ DO NOT put another `st.lucky_target = random.randint(...)` here
+
+
+async def _play_quick_math(
+    channel: discord.TextChannel, trigger_user: discord.Member, number_hit: int, game: MiniGame, st: GuildState
+) -> None:
+    display, answer = game.display, game.answer
     em = discord.Embed(
         title="🧠 Lucky Number Mini Game!",
         description=(
@@ -260,97 +2705,189 @@ async def run_quick_math(channel: discord.TextChannel, trigger_user: discord.Mem
         ),
         colour=discord.Colour.gold(),
     )
-    await channel.send(embed=em)
-
-    def check(m: discord.Message):
-        if m.author.bot:
-            return False
-        if m.channel.id != channel.id:
-            return False
-        try:
-            val = int(m.content.strip())
-        except ValueError:
-            return False
-        return val == answer
-    
     try:
-        winner_msg = await bot.wait_for("message", timeout=15.0, check=check)
-    except asyncio.TimeoutError:
-        # re-arm even if nobody solved it
-        guild = channel.guild
-        st = get_state(guild.id)
-        st["lucky_target"] = arm_new_lucky(st)
-        await channel.send("⏱️ No one solved it. Mini game over.\n📌 New lucky number armed. Keep counting.")
+        # sent together with the lucky-hit line; the clock starts once it is up
+        await post(channel, embed=em)
+        schedule_timer(("game", channel.id), time.time() + MINIGAME_SECONDS)
+        METRICS["minigames_started"] += 1
+        winner_msg = await game.future
+    finally:
+        if ACTIVE_GAMES.get(channel.id) is game:
+            del ACTIVE_GAMES[channel.id]
+        TIMERS.cancel(("game", channel.id))
+
+    if winner_msg is None:
+        METRICS["minigames_timed_out"] += 1
+        post(channel, "⏱️ No one solved it. Mini game over.\n📌 New lucky number armed. Keep counting.")
         return
 
+    METRICS["minigames_solved"] += 1
     guild = channel.guild
-    st = get_state(guild.id)
-    prize_text = st.get("lucky_prize", "Lucky number mini-game prize")
+    prize_text = st.lucky_prize
 
-    ticket_chan = None
-    with contextlib.suppress(Exception):
-        ticket_chan = await create_winner_ticket(
-            guild,
-            winner_msg.author,
-            prize=prize_text,
-            n_hit=number_hit,
-        )
+    rec = (await st.ticket_ledger()).issue(winner_msg.author.id, prize_text, number_hit)
+    EVENTS.emit(guild.id, "win", u=winner_msg.author.id, n=number_hit, tourney=bool(st.tourney_mode))
+    EVENTS.emit(guild.id, "ticket", ticket=rec.seq, u=rec.user_id, prize=prize_text, n=number_hit)
 
+    # the job is persisted and queued before the announcement goes out, so a
+    # failed send can't lose the ticket; the worker edits the announcement
+    # with the link once the channel exists, or posts the result itself if
+    # the announcement never made it
     winner_banter = pick_banter("winner", "We have a winner!")
-    claim_banter = pick_banter("claim", "Open your ticket to claim.")
-
-    if ticket_chan:
-        view = discord.ui.View()
-        view.add_item(
-            discord.ui.Button(
-                label="🎫 Open Ticket",
-                style=discord.ButtonStyle.link,
-                url=ticket_chan.jump_url,
-            )
-        )
-        result_embed = discord.Embed(
-            title="🏆 Lucky Mini-Game Winner",
-            description=(
-                f"{winner_msg.author.mention} {winner_banter}\n"
-                f"**{display} = {answer}**\n"
-                f"{claim_banter}"
-            ),
-            colour=discord.Colour.purple(),
-        )
-        await channel.send(embed=result_embed, view=view)
-    else:
-        await channel.send(
-            f"🏆 {winner_msg.author.mention} {winner_banter} **{display} = {answer}**\n"
-            f"🎟 {claim_banter}"
-        )
+    announce = f"{winner_msg.author.mention} {winner_banter}\n**{display} = {answer}**"
+    job = TicketJob(
+        None, guild.id, rec.seq, winner_msg.author.id, prize_text, number_hit,
+        channel.id, None, announce, winner_msg.author.name,
+    )
+    # solo: the ticket queue edits this embed in place later
+    job.announcement = post(channel, embed=winner_embed(announce, "🎫 Opening your ticket…"), solo=True)
+    await enqueue_ticket(job)
+    post(channel, "📌 New lucky number armed. Keep counting.")
 
-    # ✅ re-arm relative to the current count, so it never "stops"
-    st["lucky_target"] = arm_new_lucky(st)
-    await channel.send("📌 New lucky number armed. Keep counting.")
-       
     # ---- TOURNAMENT COUNTER ----
-    if st.get("tourney_mode"):
-        st["tourney_rounds"] = st.get("tourney_rounds", 0) + 1
-        uid = winner_msg.author.id
-        wins_map = st.get("tourney_wins") or {}
-        wins_map[uid] = wins_map.get(uid, 0) + 1
-        st["tourney_wins"] = wins_map
-    
-        board = sorted(wins_map.items(), key=lambda x: x[1], reverse=True)
-        top_lines = [f"**{i+1}.** <@{u}> — {c} win(s)" for i, (u, c) in enumerate(board[:5])]
-    
+    if st.tourney_mode:
+        st.tourney_rounds = st.tourney_rounds + 1
+        st.tourney_wins.add_win(winner_msg.author.id)
+        DIRTY_GUILDS.add(guild.id)
+
+        top_lines = [f"**{r}.** <@{u}> — {c} win(s)" for r, u, c in st.tourney_wins.top(5)]
+
         em_lb = discord.Embed(
             title="🏅 Tournament Leaderboard (Live)",
             description="\n".join(top_lines),
             colour=discord.Colour.orange(),
         )
-        await channel.send(embed=em_lb)
+        post(channel, embed=em_lb)
+
+    # keep the announcement's id with the job, so a restart edits it rather than posting again
+    with contextlib.suppress(Exception):
+        msg = await job.announcement
+        await asyncio.to_thread(STORE.set_ticket_job_message, job.id, msg.id)
+
+# -------------------------------------------------
+# idle banter (/aibanter_on, /aibanter_idle): a counting channel that goes
+# quiet for ai_idle_minutes gets one idle_banter line; whoever breaks the
+# silence gets an idle_banter_replies line. Each channel is one ("idle", id)
+# entry in the shared timer heap: messages only stamp IDLE_LAST_SEEN, and the
+# timer pushes itself forward when it fires early, so a busy channel touches
+# the heap about once per idle period instead of once per message.
+# -------------------------------------------------
+IDLE_DEFAULT_MINUTES = 10
+IDLE_LAST_SEEN: Dict[int, float] = {}   # channel_id -> last human message
+IDLE_BANTERED: set = set()              # channels whose silence was just bantered
+
+
+def idle_seconds(gid: int) -> float:
+    return ai_idle_minutes.get(gid, IDLE_DEFAULT_MINUTES) * 60.0
+
+
+def note_activity(cid: int, gid: int) -> bool:
+    """Stamp a human message; True if it broke a bantered silence."""
+    if not ai_helper_enabled.get(gid):
+        return False
+    now = time.time()
+    IDLE_LAST_SEEN[cid] = now
+    if ("idle", cid) not in TIMERS:
+        schedule_timer(("idle", cid), now + idle_seconds(gid))
+    if cid in IDLE_BANTERED:
+        IDLE_BANTERED.discard(cid)
+        return True
+    return False
+
+
+def _idle_due(key: Tuple) -> None:
+    cid = key[1]
+    gid = counting_guild(cid)
+    if gid is None or not ai_helper_enabled.get(gid):
+        # turned off (or no longer counting): drop the channel until it is back on
+        IDLE_LAST_SEEN.pop(cid, None)
+        return
+    deadline = IDLE_LAST_SEEN.get(cid, 0.0) + idle_seconds(gid)
+    if deadline > time.time():
+        # someone spoke since this was scheduled
+        schedule_timer(key, deadline)
+        return
+    # one line per silence; the next message re-arms the timer
+    IDLE_LAST_SEEN.pop(cid, None)
+    IDLE_BANTERED.add(cid)
+    channel = bot.get_channel(cid)
+    text = pick_banter("idle_banter")
+    if channel is not None and text:
+        post(channel, text)
+
+
+TIMER_HANDLERS["idle"] = _idle_due
 
-    # ❌ DO NOT put another `st["lucky_target"] = random.randint(...)` here
 
 # -------------------------------------------------
 # slash commands
 # -------------------------------------------------
+TOURNEY_PAGE_SIZE = 20   # 20 lines stays far below the 4096-char embed limit
+
+
+def multiply_prize(prize_text: str, wins: int) -> str:
+    # multiply prize like 2WL * wins
+    m = re.match(r"(\d+)\s*(.*)", prize_text.strip())
+    if not m:
+        return prize_text
+    base = int(m.group(1))
+    tail = m.group(2)
+    total = base * wins
+    return f"{total}{tail}"
+
+
+def tourney_pages(board: Leaderboard) -> int:
+    return max(1, -(-len(board) // TOURNEY_PAGE_SIZE))
+
+
+def tourney_page_embed(board: Leaderboard, page: int, prize: Optional[str] = None) -> discord.Embed:
+    # page is 1-based; prize given -> final results with the multiplied prize
+    pages = tourney_pages(board)
+    page = min(max(1, page), pages)
+    lines = []
+    for rank, uid, cnt in board.page((page - 1) * TOURNEY_PAGE_SIZE, TOURNEY_PAGE_SIZE):
+        if prize is None:
+            lines.append(f"**{rank}.** <@{uid}> — {cnt} win(s)")
+        else:
+            lines.append(f"**{rank}.** <@{uid}> — {cnt} win(s) → **{multiply_prize(prize, cnt)}**")
+
+    if prize is None:
+        em = discord.Embed(
+            title="🏅 Current Tournament Leaderboard",
+            description="\n".join(lines),
+            colour=discord.Colour.orange(),
+        )
+    else:
+        em = discord.Embed(
+            title="🏆 Prizo Tournament Results",
+            description="\n".join(lines),
+            colour=discord.Colour.gold(),
+        )
+    if pages > 1:
+        em.set_footer(text=f"Page {page}/{pages} • {len(board)} player(s)")
+    return em
+
+
+class TourneyPager(discord.ui.View):
+    def __init__(self, gid: int, page: int):
+        super().__init__(timeout=300)
+        self.gid = gid
+        self.page = page
+
+    async def _show(self, interaction: discord.Interaction, step: int) -> None:
+        board = get_state(self.gid).tourney_wins
+        self.page = min(max(1, self.page + step), tourney_pages(board))
+        await interaction.response.edit_message(embed=tourney_page_embed(board, self.page), view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, -1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, 1)
+
+
 @bot.tree.command(name="start_tourney", description="Start a Prizo tournament. Mini-game wins will be counted.")
 @app_commands.guild_only()
 async def start_tourney(
@@ -358,10 +2895,12 @@ async def start_tourney(
     trigger_every: int = 5  # reserved if you later want automatic triggers
 ):
     st = get_state(interaction.guild.id)
-    st["tourney_mode"] = True
-    st["tourney_wins"] = {}
-    st["tourney_rounds"] = 0
-    st["tourney_trigger"] = max(1, int(trigger_every))
+    st.tourney_mode = True
+    st.tourney_wins = Leaderboard()
+    st.tourney_rounds = 0
+    EVENTS.emit(interaction.guild.id, "tourney", on=True)
+    st.tourney_trigger = max(1, int(trigger_every))
+    DIRTY_GUILDS.add(interaction.guild.id)
     await interaction.response.send_message(
         f"🏁 Tournament Mode **enabled**!\nWins from lucky mini-games will be counted.",
         ephemeral=True,
@@ -369,92 +2908,114 @@ async def start_tourney(
 
 
 @bot.tree.command(name="show_tourney", description="Show the current tournament leaderboard.")
+@app_commands.describe(page="Leaderboard page (20 players per page)")
 @app_commands.guild_only()
-async def show_tourney(interaction: discord.Interaction):
+async def show_tourney(interaction: discord.Interaction, page: app_commands.Range[int, 1] = 1):
     st = get_state(interaction.guild.id)
-    wins = st.get("tourney_wins", {})
-    if not st.get("tourney_mode"):
+    wins = st.tourney_wins
+    if not st.tourney_mode:
         await interaction.response.send_message("❌ Tournament mode is not enabled.", ephemeral=True)
         return
     if not wins:
         await interaction.response.send_message("📋 Tournament is running but nobody has won yet.", ephemeral=True)
         return
 
-    leaderboard = sorted(wins.items(), key=lambda x: x[1], reverse=True)
-    lines = []
-    for i, (uid, cnt) in enumerate(leaderboard, 1):
-        lines.append(f"**{i}.** <@{uid}> — {cnt} win(s)")
-
-    em = discord.Embed(
-        title="🏅 Current Tournament Leaderboard",
-        description="\n".join(lines),
-        colour=discord.Colour.orange(),
-    )
-    await interaction.response.send_message(embed=em)
+    page = min(int(page), tourney_pages(wins))
+    em = tourney_page_embed(wins, page)
+    if tourney_pages(wins) > 1:
+        await interaction.response.send_message(embed=em, view=TourneyPager(interaction.guild.id, page))
+    else:
+        await interaction.response.send_message(embed=em)
 
 
 @bot.tree.command(name="end_tourney", description="End the Prizo tournament and show final prizes.")
 @app_commands.guild_only()
 async def end_tourney(interaction: discord.Interaction):
     st = get_state(interaction.guild.id)
-    if not st.get("tourney_mode"):
+    if not st.tourney_mode:
         await interaction.response.send_message("❌ No tournament running.", ephemeral=True)
         return
 
-    st["tourney_mode"] = False
-    wins = st.get("tourney_wins", {})
-    st["tourney_wins"] = {}
-    st["tourney_rounds"] = 0
+    st.tourney_mode = False
+    wins = st.tourney_wins
+    st.tourney_wins = None
+    st.tourney_rounds = 0
+    EVENTS.emit(interaction.guild.id, "tourney", on=False)
+    DIRTY_GUILDS.add(interaction.guild.id)
 
     if not wins:
         await interaction.response.send_message("🏁 Tournament ended — no wins recorded.")
         return
 
-    base_prize = st.get("lucky_prize", "1WL")
+    base_prize = st.lucky_prize
 
-    # helper inside to multiply prize like 2WL * wins
-    def multiply_prize(prize_text: str, wins: int) -> str:
-        m = re.match(r"(\d+)\s*(.*)", prize_text.strip())
-        if not m:
-            return prize_text
-        base = int(m.group(1))
-        tail = m.group(2)
-        total = base * wins
-        return f"{total}{tail}"
+    # the board is final now, so every page goes out (one embed per page)
+    await interaction.response.send_message(embed=tourney_page_embed(wins, 1, prize=base_prize))
+    for page in range(2, tourney_pages(wins) + 1):
+        await interaction.followup.send(embed=tourney_page_embed(wins, page, prize=base_prize))
 
-    leaderboard = sorted(wins.items(), key=lambda x: x[1], reverse=True)
-    lines = []
-    for i, (uid, cnt) in enumerate(leaderboard, 1):
-        final_prize = multiply_prize(base_prize, cnt)
-        lines.append(f"**{i}.** <@{uid}> — {cnt} win(s) → **{final_prize}**")
+# -------------------------------------------------
+# slash sync: only when the command tree actually changed
+# -------------------------------------------------
+SYNC_CONCURRENCY = 4
+SYNC_HASHES: Dict[str, str] = STORE.load_meta("sync:")   # "sync:global" / "sync:guild:<id>" -> tree hash
+_ready_once = False
+
+
+def command_tree_hash(guild: Optional[discord.abc.Snowflake] = None) -> str:
+    payload = [cmd.to_dict() for cmd in bot.tree.get_commands(guild=guild)]
+    payload.sort(key=lambda d: (d.get("type", 1), d["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def sync_if_changed(guild: Optional[discord.abc.Snowflake] = None) -> bool:
+    key = "sync:global" if guild is None else f"sync:guild:{guild.id}"
+    tree_hash = command_tree_hash(guild)
+    if SYNC_HASHES.get(key) == tree_hash:
+        return False
+    await bot.tree.sync(guild=guild)
+    SYNC_HASHES[key] = tree_hash
+    await asyncio.to_thread(STORE.set_meta, key, tree_hash)
+    return True
 
-    em = discord.Embed(
-        title="🏆 Prizo Tournament Results",
-        description="\n".join(lines),
-        colour=discord.Colour.gold(),
-    )
-    await interaction.response.send_message(embed=em)
 
 @bot.event
 async def on_ready():
+    global _ready_once
     print(f"[boot] logged in as {bot.user} ({bot.user.id})")
 
-    # try per-guild sync first
-    if bot.guilds:
-        for g in bot.guilds:
+    # on_ready fires again after every gateway reconnect; unchanged trees are skipped
+    sem = asyncio.Semaphore(SYNC_CONCURRENCY)
+    synced = failed = 0
+
+    async def sync_guild(g: discord.Guild) -> None:
+        nonlocal synced, failed
+        async with sem:
             try:
-                await bot.tree.sync(guild=g)
-                print(f"[slash] synced to guild: {g.name} ({g.id})")
+                if await sync_if_changed(g):
+                    synced += 1
+                    print(f"[slash] synced to guild: {g.name} ({g.id})")
             except Exception as e:
+                failed += 1
                 print(f"[slash] FAILED to sync to guild: {g.name} ({g.id}) -> {e}")
 
-    # also try global sync (sometimes per-guild is blocked)
+    await asyncio.gather(*(sync_guild(g) for g in bot.guilds))
+
+    # also global sync (sometimes per-guild is blocked)
     try:
-        await bot.tree.sync()
-        print("[slash] global sync ok")
+        if await sync_if_changed():
+            print("[slash] global sync ok")
     except Exception as e:
         print(f"[slash] global sync failed -> {e}")
 
+    print(
+        f"[slash] {synced} guild sync(s), {failed} failed, "
+        f"{len(bot.guilds) - synced - failed} unchanged"
+    )
+    if not _ready_once:
+        _ready_once = True
+        print(f"[boot] ready and serving {len(bot.guilds)} guild(s) in {time.perf_counter() - BOOT_STARTED:.2f}s")
+
 @bot.tree.command(
     name="set_ticket_category",
     description="Set the category where winner tickets will be created."
@@ -474,6 +3035,7 @@ async def set_ticket_category(
     try:
         gid = interaction.guild.id  # safer than guild_id
         set_ticket_cfg(gid, category_id=category.id)
+        EVENTS.emit(gid, "config", key="category_id", value=category.id)
 
         await interaction.response.send_message(
             f"📂 Ticket category set to **{category.name}**.",
@@ -499,6 +3061,7 @@ async def set_ticket_staff(interaction: discord.Interaction, role: discord.Role)
     if not interaction.user.guild_permissions.manage_guild:
         return await interaction.response.send_message("You need **Manage Server** permission.", ephemeral=True)
     set_ticket_cfg(interaction.guild_id, staff_role_id=role.id)
+    EVENTS.emit(interaction.guild_id, "config", key="staff_role_id", value=role.id)
     await interaction.response.send_message(f"🛡️ Ticket staff set to **{role.name}**.", ephemeral=True)
 
 
@@ -517,7 +3080,9 @@ async def set_lucky_prize(interaction: discord.Interaction, prize: str):
 
     try:
         st = get_state(interaction.guild_id)
-        st["lucky_prize"] = prize  # e.g. "2WL"
+        st.lucky_prize = prize  # e.g. "2WL"
+        EVENTS.emit(interaction.guild_id, "config", key="lucky_prize", value=prize)
+        DIRTY_GUILDS.add(interaction.guild_id)
         await interaction.response.send_message(
             f"🏅 Lucky prize set to: **{prize}**", ephemeral=True
         )
@@ -526,28 +3091,6 @@ async def set_lucky_prize(interaction: discord.Interaction, prize: str):
             f"⚠️ Error: {type(e).__name__}: {e}", ephemeral=True
         )
 
-        # ---- TOURNAMENT COUNTER ----
-    if st.get("tourney_mode"):
-        st["tourney_rounds"] = st.get("tourney_rounds", 0) + 1
-        uid = winner_msg.author.id
-        wins_map = st.get("tourney_wins") or {}
-        wins_map[uid] = wins_map.get(uid, 0) + 1
-        st["tourney_wins"] = wins_map
-
-        # post live leaderboard (top 5)
-        board = sorted(wins_map.items(), key=lambda x: x[1], reverse=True)
-        top_lines = []
-        for i, (tu, tc) in enumerate(board[:5], 1):
-            top_lines.append(f"**{i}.** <@{tu}> — {tc} win(s)")
-        if top_lines:
-            em_lb = discord.Embed(
-                title="🏅 Tournament Leaderboard (Live)",
-                description="\n".join(top_lines),
-                colour=discord.Colour.orange(),
-            )
-            await channel.send(embed=em_lb)
-
-
 
 # ====== SET LUCKY RANGE ======
 @bot.tree.command(
@@ -578,20 +3121,27 @@ async def set_lucky_range(
         st = get_state(interaction.guild.id)
 
         # update range
-        st["lucky_min"] = int(min_value)
-        st["lucky_max"] = int(max_value)
+        st.lucky_min = int(min_value)
+        st.lucky_max = int(max_value)
 
         # ✅ now we can arm relative to current count
-        st["lucky_target"] = arm_new_lucky(st)
+        st.lucky_target = arm_new_lucky(st)
 
         if prize is not None:
-            st["lucky_prize"] = prize
+            st.lucky_prize = prize
+        gid = interaction.guild.id
+        EVENTS.emit(gid, "config", key="lucky_min", value=st.lucky_min)
+        EVENTS.emit(gid, "config", key="lucky_max", value=st.lucky_max)
+        if prize is not None:
+            EVENTS.emit(gid, "config", key="lucky_prize", value=prize)
+        EVENTS.emit(gid, "lucky", target=st.lucky_target)
+        DIRTY_GUILDS.add(interaction.guild.id)
 
         await interaction.response.send_message(
             (
                 f"🎯 Lucky range set to **{min_value}–{max_value}**.\n"
-                f"Armed lucky number: **{st['lucky_target']}**.\n"
-                f"Prize: **{st['lucky_prize']}**"
+                f"Armed lucky number: **{st.lucky_target}**.\n"
+                f"Prize: **{st.lucky_prize}**"
             ),
             ephemeral=True,
         )
@@ -626,13 +3176,17 @@ async def set_milestone_range(
 
     try:
         st = get_state(interaction.guild_id)
-        st["milestone_min"] = int(min_value)
-        st["milestone_max"] = int(max_value)
+        st.milestone_min = int(min_value)
+        st.milestone_max = int(max_value)
 
-        st["next_milestone"] = random.randint(st["milestone_min"], st["milestone_max"])
+        st.next_milestone = random.randint(st.milestone_min, st.milestone_max)
+        EVENTS.emit(interaction.guild_id, "config", key="milestone_min", value=st.milestone_min)
+        EVENTS.emit(interaction.guild_id, "config", key="milestone_max", value=st.milestone_max)
+        EVENTS.emit(interaction.guild_id, "milestone", target=st.next_milestone)
+        DIRTY_GUILDS.add(interaction.guild_id)
 
         await interaction.response.send_message(
-            f"📢 Milestone range set to **{min_value}–{max_value}**. Next milestone: **{st['next_milestone']}**.",
+            f"📢 Milestone range set to **{min_value}–{max_value}**. Next milestone: **{st.next_milestone}**.",
             ephemeral=True,
         )
     except Exception as e:
@@ -640,11 +3194,94 @@ async def set_milestone_range(
             f"⚠️ Error: {type(e).__name__}: {e}", ephemeral=True
         )
 
-# AI toggles (stored only)
+# ====== TICKET ARCHIVAL ======
+@bot.tree.command(name="close_ticket", description="Archive this prize ticket (transcript saved) and delete the channel.")
+@app_commands.guild_only()
+async def close_ticket(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.manage_guild:
+        return await interaction.response.send_message("You need **Manage Server** permission.", ephemeral=True)
+    ledger = await get_state(interaction.guild_id).ticket_ledger()
+    rec = ledger.by_channel(interaction.channel_id)
+    if rec is None or rec.closed_at is not None:
+        return await interaction.response.send_message("❌ This isn't an open prize ticket.", ephemeral=True)
+    queue_archive(interaction.guild_id, interaction.channel_id)
+    await interaction.response.send_message("🗄️ Saving the transcript and closing this ticket…")
+
+
+@bot.tree.command(name="archive_tickets", description="Archive and delete prize tickets older than N days.")
+@app_commands.describe(older_than="Age in days")
+@app_commands.guild_only()
+async def archive_tickets(interaction: discord.Interaction, older_than: app_commands.Range[int, 0, 3650]):
+    if not interaction.user.guild_permissions.manage_guild:
+        return await interaction.response.send_message("You need **Manage Server** permission.", ephemeral=True)
+    ledger = await get_state(interaction.guild_id).ticket_ledger()
+    cutoff = time.time() - int(older_than) * 86400
+    queued = sum(queue_archive(interaction.guild_id, rec.channel_id) for rec in ledger.open_records(cutoff))
+    if not queued:
+        return await interaction.response.send_message(
+            f"📭 No open tickets older than **{older_than}** day(s).", ephemeral=True
+        )
+    await interaction.response.send_message(
+        f"🗄️ Archiving **{queued}** ticket(s) older than **{older_than}** day(s). "
+        f"About {int(queued * ARCHIVE_DELETE_INTERVAL) + 1}s; {ARCHIVE_QUEUE.qsize()} in the queue.",
+        ephemeral=True,
+    )
+
+
+# ====== COUNTING CHANNELS ======
+@bot.tree.command(name="set_counting_channel", description="Turn counting on in a channel (several allowed).")
+@app_commands.guild_only()
+async def set_counting_channel(interaction: discord.Interaction, channel: discord.TextChannel):
+    if not interaction.user.guild_permissions.manage_guild:
+        return await interaction.response.send_message("You need **Manage Server** permission.", ephemeral=True)
+    register_counting_channel(channel.id, interaction.guild_id)
+    EVENTS.emit(interaction.guild_id, "config", key="counting_channel", value=channel.id)
+    await asyncio.to_thread(STORE.set_counting_channel, channel.id, interaction.guild_id)
+    await interaction.response.send_message(f"🔢 Counting enabled in {channel.mention}.", ephemeral=True)
+
+
+@bot.tree.command(name="unset_counting_channel", description="Turn counting off in a channel.")
+@app_commands.guild_only()
+async def unset_counting_channel(interaction: discord.Interaction, channel: discord.TextChannel):
+    if not interaction.user.guild_permissions.manage_guild:
+        return await interaction.response.send_message("You need **Manage Server** permission.", ephemeral=True)
+    if unregister_counting_channel(channel.id) is None:
+        return await interaction.response.send_message(f"{channel.mention} is not a counting channel.", ephemeral=True)
+    ACK_LOAD.pop(channel.id, None)
+    EVENTS.emit(interaction.guild_id, "config", key="counting_channel_off", value=channel.id)
+    await asyncio.to_thread(STORE.set_counting_channel, channel.id, None)
+    await interaction.response.send_message(f"🔕 Counting disabled in {channel.mention}.", ephemeral=True)
+
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    if after.id == get_ticket_cfg(after.guild.id)[1]:
+        TICKET_TARGETS.pop(after.guild.id, None)
+
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    if role.id == get_ticket_cfg(role.guild.id)[1]:
+        TICKET_TARGETS.pop(role.guild.id, None)
+
+
+@bot.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    if channel.id == get_ticket_cfg(channel.guild.id)[0]:
+        TICKET_TARGETS.pop(channel.guild.id, None)
+    if unregister_counting_channel(channel.id) is not None:
+        ACK_LOAD.pop(channel.id, None)
+        with contextlib.suppress(Exception):
+            await asyncio.to_thread(STORE.set_counting_channel, channel.id, None)
+
+
+# AI toggles (drive the idle banter scheduler)
 @bot.tree.command(name="aibanter_on", description="Enable AI banter in counting channel.")
 @app_commands.guild_only()
 async def aibanter_on(interaction: discord.Interaction):
     ai_helper_enabled[interaction.guild_id] = True
+    EVENTS.emit(interaction.guild_id, "config", key="ai_helper", value=True)
+    DIRTY_CFG.add(interaction.guild_id)
     await interaction.response.send_message("✅ AI banter enabled.", ephemeral=True)
 
 
@@ -652,6 +3289,9 @@ async def aibanter_on(interaction: discord.Interaction):
 @app_commands.guild_only()
 async def aibanter_off(interaction: discord.Interaction):
     ai_helper_enabled[interaction.guild_id] = False
+    EVENTS.emit(interaction.guild_id, "config", key="ai_helper", value=False)
+    IDLE_BANTERED.difference_update([cid for cid in IDLE_BANTERED if counting_guild(cid) == interaction.guild_id])
+    DIRTY_CFG.add(interaction.guild_id)
     await interaction.response.send_message("✅ AI banter disabled.", ephemeral=True)
 
 
@@ -660,9 +3300,36 @@ async def aibanter_off(interaction: discord.Interaction):
 @app_commands.guild_only()
 async def aibanter_idle(interaction: discord.Interaction, minutes: app_commands.Range[int, 1, 60]):
     ai_idle_minutes[interaction.guild_id] = int(minutes)
+    EVENTS.emit(interaction.guild_id, "config", key="ai_idle_minutes", value=int(minutes))
+    DIRTY_CFG.add(interaction.guild_id)
     await interaction.response.send_message(f"⏱️ AI banter idle set to **{int(minutes)} min**.", ephemeral=True)
 
 
+@bot.tree.command(name="ack_mode", description="Show or set how counts are acknowledged (✅ reactions).")
+@app_commands.describe(mode="auto (default), always, adaptive, summary or off; leave empty to see what is in effect")
+@app_commands.choices(mode=[app_commands.Choice(name=m, value=m) for m in ACK_MODES])
+@app_commands.guild_only()
+async def ack_mode_cmd(interaction: discord.Interaction, mode: Optional[app_commands.Choice[str]] = None):
+    st = get_state(interaction.guild_id)
+    if mode is not None:
+        if not interaction.user.guild_permissions.manage_guild:
+            return await interaction.response.send_message("You need **Manage Server** permission.", ephemeral=True)
+        st.ack_mode = mode.value
+        EVENTS.emit(interaction.guild_id, "config", key="ack_mode", value=mode.value)
+        DIRTY_GUILDS.add(interaction.guild_id)
+
+    lines = [f"✅ Ack mode: **{st.ack_mode}**"]
+    if interaction.guild_id in REGISTERED_GUILDS:
+        channels = [cid for cid, gid in COUNTING_CHANNELS.items() if gid == interaction.guild_id]
+    else:
+        channels = [cid for cid in ACK_LOAD if counting_guild(cid) == interaction.guild_id]
+    for cid in channels:
+        load = ACK_LOAD.get(cid)
+        detail = f"{load.latency * 1000:.0f} ms avg" if load is not None else "no counts yet"
+        lines.append(f"<#{cid}> → **{ack_mode(st, cid)}** ({detail})")
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+
 # -------------------------------------------------
 # prefix commands
 # -------------------------------------------------
@@ -670,7 +3337,9 @@ async def aibanter_idle(interaction: discord.Interaction, minutes: app_commands.
 @commands.has_permissions(manage_guild=True)
 async def cmd_words(ctx: commands.Context):
     st = get_state(ctx.guild.id)
-    st["words_only"] = True
+    st.words_only = True
+    EVENTS.emit(ctx.guild.id, "config", key="words_only", value=True)
+    DIRTY_GUILDS.add(ctx.guild.id)
     await ctx.reply("🗣️ Words-only mode enabled. Use `one, two, three...`", mention_author=False)
 
 
@@ -678,28 +3347,31 @@ async def cmd_words(ctx: commands.Context):
 @commands.has_permissions(manage_guild=True)
 async def cmd_numbers(ctx: commands.Context):
     st = get_state(ctx.guild.id)
-    st["words_only"] = False
+    st.words_only = False
+    EVENTS.emit(ctx.guild.id, "config", key="words_only", value=False)
+    DIRTY_GUILDS.add(ctx.guild.id)
     await ctx.reply("🔢 Plain number mode enabled. Use `1, 2, 3...`", mention_author=False)
 
 
 @bot.command(name="tickets")
 @commands.has_permissions(manage_guild=True)
-async def cmd_tickets(ctx: commands.Context):
-    st = get_state(ctx.guild.id)
-    if not st["tickets"]:
+async def cmd_tickets(ctx: commands.Context, page: int = 1):
+    ledger = await get_state(ctx.guild.id).ticket_ledger()
+    if not ledger:
         await ctx.reply("🎟️ No tickets yet.", mention_author=False)
         return
 
-    counts: Dict[int, int] = {}
-    for uid in st["tickets"]:
-        counts[uid] = counts.get(uid, 0) + 1
-
-    lines = []
-    for uid, cnt in counts.items():
-        member = ctx.guild.get_member(uid)
-        name = member.mention if member else f"<@{uid}>"
-        lines.append(f"{name}: **{cnt}** ticket(s)")
-    await ctx.reply("🎟️ Tickets so far:\n" + "\n".join(lines), mention_author=False)
+    pages = ledger.pages()
+    page = min(max(1, page), pages)
+    header = f"🎟️ Tickets so far: **{len(ledger)}** for **{len(ledger.counts)}** member(s)"
+    if pages > 1:
+        header += f" — page {page}/{pages} (`{PREFIX}tickets <page>`)"
+    # mentions render as names without pinging anyone or needing the member cache
+    await ctx.reply(
+        header + "\n" + ledger.render_page(page),
+        mention_author=False,
+        allowed_mentions=discord.AllowedMentions.none(),
+    )
 
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: Exception):
@@ -713,114 +3385,347 @@ async def on_app_command_error(interaction: discord.Interaction, error: Exceptio
         pass
     print(msg)
 
+
+# -------------------------------------------------
+# flood control: token buckets per user and per channel, checked before any
+# guild state is touched. Over-limit messages get no reply (so a spammer can't
+# make the bot spam back); they are bulk-deleted a batch per channel, the same
+# way messages from benched users are.
+# -------------------------------------------------
+def parse_bucket(spec: str) -> Optional[Tuple[float, float]]:
+    # "5/5" = bursts of 5 messages, refilled over 5 seconds; "off" disables
+    if spec.strip().lower() in ("", "off", "0"):
+        return None
+    burst, _, seconds = spec.partition("/")
+    return float(burst), float(burst) / float(seconds or 1)
+
+
+class TokenBuckets:
+    """Token buckets keyed by id, bounded and self-expiring.
+
+    A bucket that has been idle long enough to refill is the same as no
+    bucket, so buckets are kept in last-touched order and swept from the old
+    end whenever a new one is added; the count is also capped outright.
+    """
+
+    def __init__(self, burst: float, rate: float, max_keys: int = 50_000):
+        self.burst = max(1.0, burst)
+        self.rate = rate
+        self.refill_seconds = self.burst / rate
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[int, List[float]]" = OrderedDict()   # key -> [tokens, last]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: int, now: float) -> bool:
+        b = self._buckets.get(key)
+        if b is None:
+            self._sweep(now)
+            self._buckets[key] = [self.burst - 1.0, now]
+            return True
+        tokens = min(self.burst, b[0] + (now - b[1]) * self.rate)
+        b[1] = now
+        self._buckets.move_to_end(key)
+        if tokens < 1.0:
+            b[0] = tokens
+            return False
+        b[0] = tokens - 1.0
+        return True
+
+    def _sweep(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, (_, last) = next(iter(buckets.items()))
+            if now - last < self.refill_seconds and len(buckets) < self.max_keys:
+                break
+            del buckets[key]
+
+
+FLOOD_USER = parse_bucket(os.getenv("PRIZO_FLOOD_USER", "5/5"))
+FLOOD_CHANNEL = parse_bucket(os.getenv("PRIZO_FLOOD_CHANNEL", "30/3"))
+FLOOD_DELETE = os.getenv("PRIZO_FLOOD_ACTION", "delete") == "delete"   # "drop" leaves them be
+USER_BUCKETS = TokenBuckets(*FLOOD_USER) if FLOOD_USER else None
+CHANNEL_BUCKETS = TokenBuckets(*FLOOD_CHANNEL) if FLOOD_CHANNEL else None
+
+PURGE_DELAY = 1.0           # collect a channel's deletions for this long, then one bulk call
+PURGE_MAX_PENDING = 500     # per channel; past this a flood is left for the mods
+PURGE_PENDING: Dict[int, List[int]] = {}   # channel_id -> message ids
+
+
+def flood_allows(message: discord.Message) -> bool:
+    now = time.monotonic()
+    if USER_BUCKETS is not None and not USER_BUCKETS.allow(message.author.id, now):
+        return False
+    if CHANNEL_BUCKETS is not None and not CHANNEL_BUCKETS.allow(message.channel.id, now):
+        return False
+    return True
+
+
+def queue_purge(message: discord.Message) -> None:
+    cid = message.channel.id
+    ids = PURGE_PENDING.get(cid)
+    if ids is None:
+        ids = PURGE_PENDING[cid] = []
+        schedule_timer(("purge", cid), time.time() + PURGE_DELAY)
+    if len(ids) < PURGE_MAX_PENDING:
+        ids.append(message.id)
+
+
+async def purge_messages(channel: discord.TextChannel, ids: List[int]) -> None:
+    for i in range(0, len(ids), 100):
+        batch = [discord.Object(id=mid) for mid in ids[i:i + 100]]
+        try:
+            await channel.delete_messages(batch)
+        except discord.Forbidden:
+            return   # no Manage Messages here; nothing else will work either
+        except discord.HTTPException as e:
+            print(f"[flood] bulk delete in {channel.id} failed: {e}")
+            continue
+        METRICS["messages_purged"] += len(batch)
+
+
+def _purge_due(key: Tuple) -> None:
+    ids = PURGE_PENDING.pop(key[1], None)
+    channel = bot.get_channel(key[1])
+    if ids and channel is not None:
+        task = asyncio.get_running_loop().create_task(purge_messages(channel, ids))
+        BACKGROUND_TASKS.add(task)
+        task.add_done_callback(BACKGROUND_TASKS.discard)
+
+
+TIMER_HANDLERS["purge"] = _purge_due
+
+
 # -------------------------------------------------
 # counting handler
 # -------------------------------------------------
-@bot.event
-async def on_message(message: discord.Message):
-    if message.author.bot or not message.guild:
-        return
+# Counting needs no lock: get_state() and apply_count() never await, so a
+# message's check-and-increment runs to completion before the loop looks at
+# the next one, and a channel's messages are applied in the order the gateway
+# delivered them. Keep everything up to the replies in count_message await-free.
 
-    # allow prefix commands
-    await bot.process_commands(message)
+# outcomes of apply_count()
+COUNT_IGNORED = 0
+COUNT_LOCKED = 1
+COUNT_DOUBLE = 2
+COUNT_WRONG = 3
+COUNT_BENCHED = 4   # wrong number that also earned a bench
+COUNT_OK = 5
 
-    gid = message.guild.id
-    st = get_state(gid)
+
+def apply_count(st: GuildState, gid: int, message: discord.Message) -> Tuple[int, int]:
+    """Check-and-increment for one message. Never awaits, so it is atomic on the loop.
+
+    Returns (outcome, expected).
+    """
+    uid = message.author.id
 
     # check locks
-    locks = st["locks"]
-    now = datetime.utcnow()
-    if message.author.id in locks:
-        if now < locks[message.author.id]:
-            with contextlib.suppress(Exception):
-                await message.delete()
-            return
-        else:
-            del locks[message.author.id]
+    locks = st.locks
+    if locks and uid in locks:
+        if time.time() < locks[uid]:
+            return COUNT_LOCKED, 0
+        # the timer may not have fired yet; expire it here
+        drop_lock(st, uid)
+        TIMERS.cancel(("lock", gid, uid))
+        DIRTY_GUILDS.add(gid)
 
     # ----- extract posted number -----
-    if st["words_only"]:
-        raw = message.content.strip().lower()
-        posted = WORD_NUMBERS.get(raw)
+    if st.words_only:
+        posted = parse_number_words(message.content)
     else:
         posted = extract_int(message.content, strict=False)
 
     # ignore non-number chat
     if posted is None:
-        return
+        return COUNT_IGNORED, 0
 
-    expected = st["current_number"] + 1
-    last_user = st["last_user_id"]
+    expected = st.current_number + 1
 
     # ----- no two in a row -----
-    if last_user == message.author.id:
-        banter_line = pick_banter("wrong", "Not two in a row.")
-        with contextlib.suppress(Exception):
-            await message.add_reaction("⛔")
-        await message.channel.send(
-            f"{message.author.mention} {banter_line} Next is **{expected}** for someone else."
-        )
-        return
+    if st.last_user_id == uid:
+        return COUNT_DOUBLE, expected
 
     # ----- WRONG NUMBER -----
     if posted != expected:
-        key = (message.channel.id, message.author.id)
-        st["wrong_streak"][key] = st["wrong_streak"].get(key, 0) + 1
+        streak = bump_wrong_streak(st, gid, message.channel.id, uid)
 
         # reset back to 1
-        # reset back to 1
-        st["current_number"] = 0
-        st["last_user_id"] = None
-        st["lucky_target"] = arm_new_lucky(st)  # re-arm close to 1
-       
+        st.current_number = 0
+        st.last_user_id = None
+        st.lucky_target = arm_new_lucky(st)  # re-arm close to 1
+        EVENTS.emit(gid, "reset", u=uid, posted=posted, expected=expected)
+        EVENTS.emit(gid, "lucky", target=st.lucky_target)
+
+        DIRTY_GUILDS.add(gid)
+        if streak >= 3:
+            clear_wrong_streak(st, gid, message.channel.id, uid)
+            bench_user(st, gid, uid)
+            return COUNT_BENCHED, expected
+        return COUNT_WRONG, expected
+
+    # ----- SUCCESS -----
+    st.current_number = expected
+    st.last_user_id = uid
+    EVENTS.emit(gid, "count", n=expected, u=uid)
+    if st.wrong_streak:
+        clear_wrong_streak(st, gid, message.channel.id, uid)
+    DIRTY_GUILDS.add(gid)
+    return COUNT_OK, expected
+
+
+@bot.event
+async def on_message(message: discord.Message):
+    # the histogram covers the whole handler: prefix dispatch, the registry
+    # miss, flood control and game answers as well as counting
+    t0 = time.perf_counter()
+    try:
+        await handle_message(message)
+    finally:
+        H_ON_MESSAGE.observe(time.perf_counter() - t0)
+
+
+async def handle_message(message: discord.Message) -> None:
+    if message.author.bot or not message.guild:
+        return
+
+    # pre-dispatch: only text that can be a prefix command goes to the command
+    # framework (Context + prefix parsing); "42" never pays for it
+    if message.content.startswith(PREFIX):
+        await bot.process_commands(message)
+        return
+
+    # O(1) registry check: in a guild with registered channels, regular chat
+    # never reaches state lookup or the regex
+    gid = COUNTING_CHANNELS.get(message.channel.id)
+    if gid is None:
+        if message.guild.id in REGISTERED_GUILDS:
+            return
+        gid = message.guild.id
+
+    if not flood_allows(message):
+        METRICS["flood_dropped"] += 1
+        if FLOOD_DELETE:
+            queue_purge(message)
+        return
+
+    if note_activity(message.channel.id, gid):
+        reply = pick_banter("idle_banter_replies")
+        if reply:
+            post(message.channel, reply)
+
+    # a correct mini-game answer is consumed by the game, not counted
+    game = ACTIVE_GAMES.get(message.channel.id)
+    if game is not None and game.offer(message):
+        return
+
+    await count_message(message)
+
+
+async def count_message(message: discord.Message) -> None:
+    # settle the count first, without awaiting (see above)
+    gid = message.guild.id
+    st = get_state(gid)
+    outcome, expected = apply_count(st, gid, message)
+    MSG_OUTCOMES[outcome] += 1
+
+    milestone_hit = lucky_hit = False
+    if outcome == COUNT_OK:
+        # milestone (dynamic)
+        if expected == st.next_milestone:
+            milestone_hit = True
+            st.next_milestone = random.randint(st.milestone_min, st.milestone_max)
+            EVENTS.emit(gid, "milestone", target=st.next_milestone)
+        # only the message that actually reached the target can claim it;
+        # disarm so nobody re-triggers it while the mini-game runs
+        if expected == st.lucky_target:
+            if message.channel.id in ACTIVE_GAMES:
+                # one game per channel: a target re-armed mid-game (a reset,
+                # /set_lucky_range) and hit again is just moved along
+                st.lucky_target = arm_new_lucky(st)
+                EVENTS.emit(gid, "lucky", target=st.lucky_target)
+            else:
+                lucky_hit = True
+                st.lucky_target = None
+                EVENTS.emit(gid, "lucky", target=None)
+                game = ACTIVE_GAMES[message.channel.id] = MiniGame()
+
+    # ----- replies (the count is already settled) -----
+    if outcome == COUNT_IGNORED:
+        return
+
+    if outcome == COUNT_LOCKED:
+        queue_purge(message)
+        return
+
+    if outcome == COUNT_DOUBLE:
+        banter_line = pick_banter("wrong", "Not two in a row.")
+        post(
+            message.channel,
+            f"{message.author.mention} {banter_line} Next is **{expected}** for someone else."
+        )
+        await acknowledge(message, st, "⛔")
+        return
+
+    if outcome in (COUNT_WRONG, COUNT_BENCHED):
         wrong_line = pick_banter("wrong", "Wrong number.")
-        await message.channel.send(
+        post(
+            message.channel,
             f"❌ {wrong_line} {message.author.mention} Count is back to **1**."
         )
 
-
-        if st["wrong_streak"][key] >= 3:
-            st["wrong_streak"][key] = 0
-            ban_minutes = st["ban_minutes"]
-            until = datetime.utcnow() + timedelta(minutes=ban_minutes)
-            st["locks"][message.author.id] = until
+        if outcome == COUNT_BENCHED:
+            ban_minutes = st.ban_minutes
             roast = pick_banter("roast", "Have a sit-down and count sheep, not numbers.")
-            await message.channel.send(
+            post(
+                message.channel,
                 f"🚫 {message.author.mention} benched for **{ban_minutes} minutes**. {roast}"
             )
         return  # <- important
 
-    # ----- SUCCESS -----
-    st["current_number"] = expected
-    st["last_user_id"] = message.author.id
-    st["wrong_streak"][(message.channel.id, message.author.id)] = 0
-
-    with contextlib.suppress(Exception):
-        await message.add_reaction("✅")
+    # fun fact for interesting numbers (the bigger announcements take precedence)
+    if not milestone_hit and not lucky_hit:
+        fact = pick_fun_fact(expected, message.channel.id)
+        if fact:
+            post(message.channel, fact)
 
-    # milestone (dynamic)
-    if expected == st.get("next_milestone"):
+    if milestone_hit:
         mile_line = pick_banter("milestone", f"Milestone {expected} smashed!")
         em = discord.Embed(
             title="🎉 Milestone!",
             description=f"{mile_line}\nCount reached **{expected}** by {message.author.mention}",
             colour=discord.Colour.gold()
         )
-        await message.channel.send(embed=em)
-        st["next_milestone"] = random.randint(st["milestone_min"], st["milestone_max"])
+        post(message.channel, embed=em)
 
     # lucky number → mini game
-    if expected == st.get("lucky_target"):
-        await message.channel.send(
+    if lucky_hit:
+        post(
+            message.channel,
             f"🎯 Lucky number **{expected}** hit by {message.author.mention}! Mini-game starting..."
         )
-        try:
-            await run_quick_math(message.channel, message.author, expected)
-        except Exception as e:
-            # show the real problem instead of hiding it
-            await message.channel.send(f"⚠️ Mini-game error: `{type(e).__name__}: {e}`")
+        # the game runs on its own task so on_message is done once the count is
+        task = asyncio.create_task(play_minigame(message.channel, message.author, expected, game))
+        BACKGROUND_TASKS.add(task)
+        task.add_done_callback(BACKGROUND_TASKS.discard)
+
+    # last: every reply above is already queued, none of them waits on this
+    await acknowledge(message, st, "✅")
+
+async def rebuild_store_from_log() -> int:
+    # offline recovery: snapshot + log tail -> store, no Discord connection
+    replayed = replay_event_log()
+    await flush_state()
+    return replayed
+
 
 if __name__ == "__main__":
+    if "--replay-events" in sys.argv:
+        n = asyncio.run(rebuild_store_from_log())
+        print(f"[events] replayed {n} event(s) from {EVENT_LOG_PATH} into {DB_PATH}")
+        STORE.close()
+        sys.exit(0)
     try:
         bot.run(TOKEN)
     except Exception as e:
@@ -0,0 +1,111 @@
+# tests/test_word_numbers.py
+#
+# parse_number_words against the zero..five_hundred table that banter.json
+# used to ship (regenerated here in its exact underscore form), its space and
+# hyphen spellings, and a round trip through a number-to-words renderer up to
+# a billion.
+#
+#   python -m pytest -q tests
+
+import os
+import sys
+import random
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# bot.py refuses to import without a token; keep it off the real database
+os.environ.setdefault("DISCORD_TOKEN", "test")
+os.environ.setdefault("PRIZO_DB", ":memory:")
+os.environ.setdefault("PRIZO_EVENT_LOG", "")
+os.environ.setdefault("PRIZO_METRICS_PORT", "0")
+
+from bot import parse_number_words  # noqa: E402
+
+ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine",
+        "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen",
+        "seventeen", "eighteen", "nineteen"]
+TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+SCALES = [(10 ** 9, "billion"), (10 ** 6, "million"), (10 ** 3, "thousand")]
+
+
+def below_thousand(n: int, sep: str = " ", tens_sep: str = "-", use_and: bool = False) -> str:
+    words = []
+    if n >= 100:
+        words += [ONES[n // 100], "hundred"]
+        n %= 100
+        if n and use_and:
+            words.append("and")
+    if n >= 20:
+        words.append(TENS[n // 10] + (tens_sep + ONES[n % 10] if n % 10 else ""))
+    elif n:
+        words.append(ONES[n])
+    return sep.join(words)
+
+
+def to_words(n: int, sep: str = " ", tens_sep: str = "-", use_and: bool = False) -> str:
+    if n == 0:
+        return "zero"
+    parts = []
+    for value, name in SCALES:
+        if n >= value:
+            parts.append(below_thousand(n // value, sep, tens_sep, use_and) + sep + name)
+            n %= value
+    if n:
+        parts.append(below_thousand(n, sep, tens_sep, use_and))
+    return sep.join(parts)
+
+
+def legacy_table():
+    # the banter.json "word_numbers" table: zero .. five_hundred, underscores only
+    return {to_words(n, "_", "_"): n for n in range(501)}
+
+
+def test_legacy_table_shape():
+    table = legacy_table()
+    assert len(table) == 501
+    # spot checks against entries of the table as it shipped
+    for key, n in (("zero", 0), ("twenty_one", 21), ("one_hundred", 100), ("one_hundred_one", 101),
+                   ("one_hundred_ten", 110), ("one_hundred_twenty_one", 121),
+                   ("one_hundred_ninety_nine", 199), ("five_hundred", 500)):
+        assert table[key] == n
+
+
+@pytest.mark.parametrize("form", ["underscore", "space", "hyphen", "upper"])
+def test_legacy_table(form):
+    for key, n in legacy_table().items():
+        text = {
+            "underscore": key,
+            "space": key.replace("_", " "),
+            "hyphen": key.replace("_", "-"),
+            "upper": "  " + key.replace("_", " ").upper() + " ",
+        }[form]
+        assert parse_number_words(text) == n, text
+
+
+def test_and_forms():
+    assert parse_number_words("five hundred and one") == 501
+    assert parse_number_words("one thousand and twenty-one") == 1021
+    assert parse_number_words("two_thousand") == 2000
+
+
+def test_round_trip_to_millions():
+    rng = random.Random(501)
+    numbers = list(range(0, 2000)) + [rng.randrange(10 ** 9) for _ in range(5000)]
+    numbers += [10 ** 6, 10 ** 6 + 1, 999_999, 1_000_100, 999_999_999, 10 ** 9]
+    for n in numbers:
+        for kwargs in ({}, {"use_and": True}, {"sep": "_", "tens_sep": "_"}, {"tens_sep": " "}):
+            text = to_words(n, **kwargs)
+            assert parse_number_words(text) == n, text
+
+
+@pytest.mark.parametrize("text", [
+    "", "and", "hello", "one two", "twenty ten", "eleven five", "thousand", "hundred",
+    "five hundred hundred", "thousand million", "one thousand two thousand", "zero one",
+    "one zero", "twenty one dogs",
+])
+def test_rejects(text):
+    assert parse_number_words(text) is None